@@ -0,0 +1,61 @@
+import asyncio
+import dataclasses
+import time
+
+from config import read_config
+from fightparser import FightParser
+from log import log_msg
+
+# Snapshots to compare per run; the full archive is not needed to catch a backend that reads pages differently.
+SAMPLE_SIZE = 500
+
+
+async def extract_all(extract, documents: list) -> tuple[list, float]:
+    """Runs one parser's extraction over the sampled pages, returning its results (or the exception each page raised) and the seconds it took."""
+
+    start = time.perf_counter()
+    results = []
+    for entry, read in documents:
+        try:
+            results.append(await extract(read()))
+        except Exception as error:
+            results.append(type(error).__name__)
+
+    return results, time.perf_counter() - start
+
+
+async def main():
+
+    log_msg(
+        f"\n[START]: The '__main__' function was called >>> Fights Parser Backend Comparison beginning...\n"
+    )
+
+    config = read_config("./fights-config.json")
+
+    with FightParser(
+        dataclasses.replace(config, html_parser="html.parser", targeted_parsing=False)
+    ) as reference, FightParser(config) as candidate:
+        documents = reference.files[:SAMPLE_SIZE]
+
+        expected, reference_time = await extract_all(reference.extract_fight, documents)
+        actual, candidate_time = await extract_all(candidate.extract_fight, documents)
+
+    mismatches = [
+        entry["ident"]
+        for (entry, _), want, got in zip(documents, expected, actual)
+        if want != got
+    ]
+    log_msg(
+        f"[Backends]: {candidate.features}{' (targeted)' if candidate.parse_only else ''} matched full-page html.parser on {len(documents) - len(mismatches)}/{len(documents)} fight pages ({reference_time:.2f} vs {candidate_time:.2f} seconds)."
+    )
+    if mismatches:
+        log_msg(f"[Backends]: Pages that differ: {mismatches[:20]}")
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    log_msg(
+        f"\n[EXIT]: The entire program was completed in a total of: {elapsed} seconds!\n"
+    )
@@ -19,6 +19,22 @@ class ScrapeConfig:
     base_href: str
     collected_fights_dir: str
     headers: str
+    rate_limit: float = 10.0
+    rate_burst: int = 15
+    concurrency: int = 15
+    max_concurrency: int = 25
+    max_attempts: int = 4
+    retry_base_delay: float = 1.0
+    journal_file: str = "./crawl-journal.sqlite3"
+    snapshot_store_dir: str = "./snapshot-store"
+    skip_unchanged: bool = False
+    keep_versions: int = 3
+    bundle_file: str = "./snapshot-bundle.tar"
+    parse_from_bundle: bool = False
+    html_parser: str = "lxml"
+    targeted_parsing: bool = True
+    parse_workers: int = 1
+    parse_chunk_size: int = 100
 
 
 def read_config(config_file: str) -> ScrapeConfig:
@@ -1,5 +1,6 @@
 import pyodbc
 import time
+from datetime import datetime
 
 import pandas as pd
 import sqlalchemy
@@ -7,7 +8,7 @@ from contextlib import asynccontextmanager
 import logging
 
 from config import read_config, ScrapeConfig
-from utils import build_next_url
+from utils import build_next_url, pending_fights
 from log import log_msg
 
 
@@ -244,13 +245,40 @@ def get_fight_ids_in_fightsnips_table() -> list:
         return [x[0] for x in cursor.fetchall()]
 
 
+def get_new_fight_ids_in_fightsnips_table(
+    since: datetime = None,
+) -> tuple[list, datetime]:
+    """SQL query that returns the 'event_fight_id' of every fightsnips row uploaded after since (all rows when since is None), with the newest upload date read."""
+
+    with SQLServer(DRIVER) as cursor:
+        cursor.execute(
+            "SELECT MAX([upload_date]) FROM [BoxingTestDB].[dbo].[fightsnips]"
+        )
+        latest = cursor.fetchone()[0]
+        if latest is None or (since is not None and latest <= since):
+            return [], since
+
+        # Bounded by latest, so rows uploaded while this runs are left for the next mark.
+        if since is None:
+            cursor.execute(
+                "SELECT DISTINCT([fsnip_event_fight_id]) FROM [BoxingTestDB].[dbo].[fightsnips] WHERE [upload_date] <= ?",
+                latest,
+            )
+        else:
+            cursor.execute(
+                "SELECT DISTINCT([fsnip_event_fight_id]) FROM [BoxingTestDB].[dbo].[fightsnips] WHERE [upload_date] > ? AND [upload_date] <= ?",
+                since,
+                latest,
+            )
+
+        return [x[0] for x in cursor.fetchall()], latest
+
+
 def get_fight_urls_not_in_db(config: ScrapeConfig) -> list:
     """SQL query that returns a list of 'fight URLs' found in the careers(fightsnips) table, not yet in the fights table."""
 
-    curr_careers_fights_urls = get_fight_ids_in_fightsnips_table()
-    curr_fights_fights_urls = get_fight_ids_in_fights_table()
-    return [
-        build_next_url(config, x)
-        for x in curr_careers_fights_urls
-        if x not in curr_fights_fights_urls
-    ]
+    pending = pending_fights(
+        get_fight_ids_in_fightsnips_table(), get_fight_ids_in_fights_table()
+    )
+
+    return [build_next_url(config, x) for x in pending.values()]
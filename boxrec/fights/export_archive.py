@@ -0,0 +1,32 @@
+import os
+import time
+
+from config import read_config
+from exporters import SNAPSHOT_KIND, open_snapshot_store
+from log import log_msg
+from snapshotstore import export_bundle
+
+
+def main():
+
+    log_msg(
+        f"\n[START]: The '__main__' function was called >>> Fights Archive Export beginning...\n"
+    )
+
+    config = read_config("./fights-config.json")
+
+    with open_snapshot_store(config) as store:
+        exported, loose = export_bundle(store, config.bundle_file, SNAPSHOT_KIND)
+
+    log_msg(
+        f"[Bundle]: Exported {exported} pages to {config.bundle_file} ({os.path.getsize(config.bundle_file) / 1_048_576:.2f} MB); {loose} loose legacy files were left out (compact.py packs them into the store)."
+    )
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    elapsed = time.perf_counter() - start
+    log_msg(
+        f"\n[EXIT]: The entire program was completed in a total of: {elapsed} seconds!\n"
+    )
@@ -1,4 +1,7 @@
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import asyncio
 import csv
 import pathlib
 import time
@@ -7,38 +10,171 @@ import pandas as pd
 
 from config import ScrapeConfig
 from fight import Fight
-from utils import build_next_url
-from db import get_fight_ids_in_fightsnips_table
+from utils import build_next_url, fight_shard, pending_fights, well_formed_fight_ids
+from db import (
+    get_fight_ids_in_fightsnips_table,
+    get_new_fight_ids_in_fightsnips_table,
+)
 from log import log_msg
+from journal import CrawlJournal, DONE, PENDING
+from snapshotstore import SnapshotStore, sync_catalog
 
+SNAPSHOT_KIND = "fights"
+# Journal high-water mark: the newest fightsnips upload date already queued.
+FIGHTSNIPS_WATERMARK = "fightsnips.upload_date"
 
-async def export_scraped_content(collected_fights: list[str]) -> None:
-    """Saves html scraped from collected_fights pages to a locally accessible directory."""
 
-    start = time.perf_counter()
+def snapshot_key(fight: dict) -> str:
+    """Returns the snapshot store key a scraped fight page is saved under."""
 
-    scrape_output_dir = pathlib.Path().resolve() / "snapshots"
-    scrape_output_dir.mkdir(parents=True, exist_ok=True)
+    return f"id-{fight.get('event_fight_id').replace('/','-')}"
 
-    for count, fight in enumerate(collected_fights):
-        event_fight_id = fight.get("event_fight_id")
-        response_text = fight.get("response_text")
-        output_file = scrape_output_dir / f"id-{event_fight_id.replace('/','-')}.html"
-        try:
-            output_file.write_text(response_text)
-            log_msg(
-                f"Saved {count+1}/{len(collected_fights)} html files... event_fight_id#: {event_fight_id}"
-            )
-        except:
-            log_msg(
-                f"event_fight_id: {event_fight_id}, did not have the proper encoding and was skipped!"
-            )
+
+def describe_snapshot(key: str) -> tuple[str, str, int, str]:
+    """Returns the catalog (kind, ident, part, shard) of a fight snapshot key, where ident is the 'event_fight_id' and shard its event prefix, or None if the key is not a fight page."""
+
+    if not key.startswith("id-"):
+        return None
+
+    event_fight_id = key.split("id-")[1].replace("-", "/")
+
+    return SNAPSHOT_KIND, event_fight_id, 0, fight_shard(event_fight_id)
+
+
+def save_snapshot(store: SnapshotStore, fight: dict) -> None:
+    """Saves html scraped from a single fight page to the snapshot store."""
+
+    event_fight_id = fight.get("event_fight_id")
+    key = snapshot_key(fight)
+
+    try:
+        store.put(
+            key,
+            fight.get("response_text"),
+            fight.get("url"),
+            *describe_snapshot(key),
+        )
+    except UnicodeEncodeError:
+        log_msg(
+            f"event_fight_id: {event_fight_id}, did not have the proper encoding and was skipped!"
+        )
+
+
+def open_snapshot_store(config: ScrapeConfig) -> SnapshotStore:
+    """Opens the snapshot store, registering the fights archive directory with its catalog on first use."""
+
+    store = SnapshotStore(config.snapshot_store_dir)
+    sync_catalog(store, config.fights_store, describe_snapshot)
+
+    return store
+
+
+def shard_archive(config: ScrapeConfig) -> tuple[int, int]:
+    """Moves the flat fights archive into one folder per shard, points the catalog at the moved files, and fills in the shard of pages cataloged before sharding; returns (files moved, pages sharded)."""
+
+    root = pathlib.Path(config.fights_store)
+    moved = 0
+    for file in [path for path in root.glob("*") if path.is_file()]:
+        description = describe_snapshot(file.stem)
+        if description is None:
             continue
+        target = root / description[3] / file.name
+        target.parent.mkdir(exist_ok=True)
+        file.replace(target)
+        moved += 1
 
-    elapsed = time.perf_counter() - start
-    log_msg(
-        f"\n[FightsExport]: Fights Scraper has saved the available fights page html bodies: {elapsed} seconds!\n"
-    )
+    with open_snapshot_store(config) as store:
+        sync_catalog(store, config.fights_store, describe_snapshot, refresh=True)
+        sharded = store.set_shards(SNAPSHOT_KIND, fight_shard)
+
+    return moved, sharded
+
+
+class SnapshotWriter:
+    """Saves scraped pages from a bounded queue on a dedicated writer thread, in batches that are synced to disk once each, so disk latency never holds up the event loop."""
+
+    def __init__(
+        self,
+        save: Callable[[dict], None],
+        sync: Callable[[], None] = None,
+        maxsize: int = 100,
+        batch_size: int = 25,
+        on_saved: Callable[[dict], None] = None,
+    ) -> None:
+        self.save = save
+        self.sync = sync
+        # Called (on the event loop) for each page once its batch is saved and synced, e.g. to journal its URL as done.
+        self.on_saved = on_saved
+        self.queue = asyncio.Queue(maxsize)
+        self.batch_size = batch_size
+        # One thread keeps appends to the open segment in arrival order.
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="snapshot-writer")
+        self.saved = 0
+
+    async def __aenter__(self) -> "SnapshotWriter":
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            await self.put(None)
+            await self.task
+        finally:
+            self.executor.shutdown()
+
+    def check(self) -> None:
+        """Re-raises the error that stopped the writer task, if it has stopped."""
+
+        if self.task.done():
+            self.task.result()
+            raise RuntimeError("The snapshot writer has stopped.")
+
+    async def put(self, page: dict) -> None:
+        """Hands a fetched page to the writer, waiting if the queue is full; raises the writer's error instead if it stops (e.g. the disk is full), so a crawl can never wait on a dead writer."""
+
+        self.check()
+        put = asyncio.create_task(self.queue.put(page))
+        try:
+            await asyncio.wait((put, self.task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stuck = not put.done()
+            put.cancel()
+        if stuck:
+            self.check()
+
+    def save_batch(self, pages: list[dict]) -> None:
+        """Saves a batch of pages and syncs them to disk together (runs on the writer thread)."""
+
+        for page in pages:
+            self.save(page)
+        if self.sync is not None:
+            self.sync()
+
+        log_msg(f"Saved {len(pages)} snapshots... total: {self.saved + len(pages)}")
+
+    async def run(self) -> None:
+        """Writes queued pages in batches (whatever has queued up while the last batch was written) until the closing sentinel arrives."""
+
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            pages = [await self.queue.get()]
+            while len(pages) < self.batch_size and not self.queue.empty():
+                pages.append(self.queue.get_nowait())
+
+            closing = pages[-1] is None
+            pages = [page for page in pages if page is not None]
+            if not pages:
+                continue
+
+            await loop.run_in_executor(self.executor, self.save_batch, pages)
+            if self.on_saved is not None:
+                for page in pages:
+                    self.on_saved(page)
+            # Release the bodies once they are on disk so memory stays flat for the rest of the crawl.
+            for page in pages:
+                page["response_text"] = None
+            self.saved += len(pages)
 
 
 async def save_df_to_csv(config: ScrapeConfig, df: pd.DataFrame) -> None:
@@ -133,14 +269,38 @@ async def save_all_fights_to_csv(config: ScrapeConfig, all_fights: list[Fight])
 
 
 def get_fight_urls_not_in_archive(config: ScrapeConfig):
-    """Compares careers(fightsnip) table from database to saved files and returns a list of URLs not yet saved."""
+    """Compares careers(fightsnip) table from database to the snapshot catalog and returns a list of URLs not yet saved."""
+
+    with open_snapshot_store(config) as store:
+        pending = pending_fights(
+            get_fight_ids_in_fightsnips_table(), store.idents(SNAPSHOT_KIND)
+        )
+
+    return [build_next_url(config, x) for x in pending.values()]
+
 
-    curr_fsnips_fight_ids = get_fight_ids_in_fightsnips_table()
+def get_fight_urls_pending(config: ScrapeConfig, refresh: bool = False) -> list[str]:
+    """Returns the fight URLs still pending in the crawl journal, after queueing the fights added to the fightsnips table since the last run; the journal is re-seeded from the whole table and reconciled with the snapshot catalog (failed URLs retried) on first use or when refresh=True."""
 
-    directory = config.fights_store
-    files = [
-        str(file).split("id-")[1].split(".html")[0].replace("-", "/")
-        for file in list(pathlib.Path(directory).glob("*"))
-    ]
+    with CrawlJournal(config.journal_file) as journal:
+        seed = refresh or not journal.is_seeded()
+        # Every profiles run can add fights to fightsnips; only rows uploaded past the journal's mark are read, and URLs already journaled keep their state.
+        mark = None if seed else journal.watermark(FIGHTSNIPS_WATERMARK)
+        fight_ids, latest = get_new_fight_ids_in_fightsnips_table(
+            datetime.fromisoformat(mark) if mark else None
+        )
+        journal.add(
+            [build_next_url(config, x) for x in well_formed_fight_ids(fight_ids)]
+        )
+        if seed:
+            journal.mark(journal.failed(), PENDING)
+            with open_snapshot_store(config) as store:
+                journal.mark(
+                    [build_next_url(config, x) for x in store.idents(SNAPSHOT_KIND)],
+                    DONE,
+                )
+            journal.set_seeded()
+        if latest is not None:
+            journal.set_watermark(FIGHTSNIPS_WATERMARK, str(latest))
 
-    return [build_next_url(config, x) for x in curr_fsnips_fight_ids if x not in files]
+        return journal.pending()
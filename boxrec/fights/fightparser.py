@@ -1,45 +1,41 @@
 from pathlib import Path
 from datetime import date, datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator
+import asyncio
 import re
 import time
 
-from bs4 import BeautifulSoup as bs
+from bs4 import BeautifulSoup as bs, SoupStrainer
 
 from config import ScrapeConfig
 from fight import Fight, from_dict_to_dataclass
 from log import log_msg
+from snapshotstore import SnapshotBundle, snapshot_documents
 from wrangle import (
+    FIGHT_PAGE_PARTS,
     create_soup,
+    soup_backend,
     clean_str,
-    curr_event_fight_id,
     convert_to_float,
     convert_to_feet_float,
 )
-from exporters import save_df_to_csv, save_all_fights_to_csv
+from exporters import (
+    SNAPSHOT_KIND,
+    open_snapshot_store,
+    save_df_to_csv,
+    save_all_fights_to_csv,
+)
 from db import make_new_fights_table, insert_fights_df_to_db
 
 
-class FightParser:
-    def __init__(self, config: ScrapeConfig):
-        self.config = config
-        self.files = self.mount_files()
-        self.archived = self.mount_archived()
-
-    def mount_files(self) -> list[Path]:
-        """Used in class initializer to make available the snapshots folder as a class instance variable."""
-
-        directory = "snapshots"
-        files = list(Path(directory).glob("*"))
-
-        return files
+class FightExtractor:
+    """Extracts a Fight from a fight page; it holds no store or catalog, so parse worker processes can build one."""
 
-    def mount_archived(self) -> Path:
-        """Used in class initializer to make available the snapshots folder as a class instance variable."""
-
-        directory = self.config.fights_store
-        files = list(Path(directory).glob("*"))
-
-        return files
+    def __init__(self, features: str, parse_only: SoupStrainer = None) -> None:
+        self.features = features
+        self.parse_only = parse_only
 
     def add_fight_date(self, h2_tags: list[bs], fight_dict: dict) -> None:
 
@@ -437,7 +433,7 @@ class FightParser:
 
         fight_dict = {}
 
-        soup = await create_soup(response_text)
+        soup = await create_soup(response_text, self.features, self.parse_only)
 
         h2_tags = soup.find_all("h2")
         div_venue_chk = soup.find("div", style="text-align:left;display:inline-block;")
@@ -492,28 +488,116 @@ class FightParser:
 
         return from_dict_to_dataclass(Fight, fight_dict)
 
+
+class FightParser(FightExtractor):
+    def __init__(self, config: ScrapeConfig, shard: str = None):
+        super().__init__(
+            soup_backend(config.html_parser),
+            FIGHT_PAGE_PARTS if config.targeted_parsing else None,
+        )
+        self.config = config
+        # A parser given a shard reads (and keeps its watermark for) that shard alone, so shards can be parsed by separate workers.
+        self.shard = shard
+        self.name = type(self).__name__ + (f":{shard}" if shard else "")
+        self.store = open_snapshot_store(config)
+        # With skip_unchanged, only pages whose content changed since the last mark_parsed() are read.
+        self.since = self.store.watermark(self.name) if config.skip_unchanged else None
+        self.cataloged_at = time.time()
+        self.files = self.mount_catalog()
+
+    def mount_catalog(self) -> list:
+        """Used in class initializer to make available the cataloged fight pages (registering the archive directory on first use) as a class instance variable."""
+
+        # With parse_from_bundle, pages are read in place from an exported bundle instead of the store.
+        self.source = (
+            SnapshotBundle(self.config.bundle_file)
+            if self.config.parse_from_bundle
+            else self.store
+        )
+
+        return snapshot_documents(self.source, SNAPSHOT_KIND, self.since, self.shard)
+
+    def mark_parsed(self) -> None:
+        """Records that every page in this parser's catalog has been parsed and loaded, so a later skip_unchanged run starts after them."""
+
+        self.store.set_watermark(self.name, self.cataloged_at)
+
+    def __enter__(self) -> "FightParser":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the bundle the catalog was read from (if any) and the snapshot store."""
+
+        if self.source is not self.store:
+            self.source.close()
+        self.store.close()
+
+    async def extract_in_process(self) -> AsyncIterator[tuple[Any, Fight]]:
+        """Yields (catalog entry, Fight) for every cataloged page, extracted one by one in this process."""
+
+        for entry, read in self.files:
+            yield entry, await self.extract_fight(read())
+
+    async def extract_in_pool(self) -> AsyncIterator[tuple[Any, Fight]]:
+        """Yields (catalog entry, Fight) for every cataloged page in catalog order, extracted in chunks by a pool of parse_workers processes; only two chunks per worker are read ahead, so memory stays bounded however large the archive."""
+
+        loop = asyncio.get_running_loop()
+        workers = self.config.parse_workers
+        size = self.config.parse_chunk_size
+        chunks = [self.files[i : i + size] for i in range(0, len(self.files), size)]
+
+        with ProcessPoolExecutor(workers) as pool:
+            in_flight = deque()
+            for chunk in chunks:
+                pages = [read() for entry, read in chunk]
+                in_flight.append(
+                    (
+                        chunk,
+                        loop.run_in_executor(
+                            pool, extract_fights, self.features, self.parse_only, pages
+                        ),
+                    )
+                )
+                if len(in_flight) < 2 * workers:
+                    continue
+
+                chunk, fights = in_flight.popleft()
+                for (entry, _), fight in zip(chunk, await fights):
+                    yield entry, fight
+
+            while in_flight:
+                chunk, fights = in_flight.popleft()
+                for (entry, _), fight in zip(chunk, await fights):
+                    yield entry, fight
+
     async def parse(self) -> list[Fight]:
 
         start = time.perf_counter()
 
         all_fights = []
 
-        files = self.archived
-
-        for count, file in enumerate(files):
-            with open(file, "r") as f:
-                response_text = f.read()
+        files = self.files
+        extracted = (
+            self.extract_in_pool()
+            if self.config.parse_workers > 1
+            else self.extract_in_process()
+        )
 
-                event_fight_id = await curr_event_fight_id(file)
+        count = 0
+        async for entry, fight in extracted:
+            event_fight_id = entry["ident"]
 
-                fight = await self.extract_fight(response_text)
-                fight.event_fight_id = event_fight_id
-                fight.fight_id = int(event_fight_id.split("/")[1])
-                fight.event_id = int(event_fight_id.split("/")[0])
-                all_fights.append(fight)
-                log_msg(
-                    f"Fight Parser extracted data from html file: {count+1}/{len(list(files))}... event_fight_id - ID#: {event_fight_id}"
-                )
+            fight.event_fight_id = event_fight_id
+            fight.fight_id = int(event_fight_id.split("/")[1])
+            fight.event_id = int(event_fight_id.split("/")[0])
+            all_fights.append(fight)
+            log_msg(
+                f"Fight Parser extracted data from html file: {count+1}/{len(files)}... event_fight_id - ID#: {event_fight_id}"
+            )
+            count += 1
 
         elapsed = time.perf_counter() - start
         log_msg(
@@ -521,3 +605,16 @@ class FightParser:
         )
 
         return all_fights
+
+
+def extract_fights(
+    features: str, parse_only: SoupStrainer, pages: list[bytes]
+) -> list[Fight]:
+    """Extracts a chunk of fight pages, in order (runs in a parse worker process)."""
+
+    async def extract_all() -> list[Fight]:
+        extractor = FightExtractor(features, parse_only)
+
+        return [await extractor.extract_fight(page) for page in pages]
+
+    return asyncio.run(extract_all())
@@ -1,58 +1,200 @@
 import aiohttp
 import asyncio
 import time
+from functools import partial
 
 from config import ScrapeConfig
-from exporters import export_scraped_content
+from exporters import SnapshotWriter, save_snapshot, snapshot_key
 from log import log_msg
+from journal import CrawlJournal
+from snapshotstore import SnapshotStore
+from throttle import RateLimiter, AdaptiveConcurrency
+from retry import RetryPolicy, DeadLetters
 from utils import curr_event_fight_id
-from fightrequest import create_agents_list, random_header_agent, fetch_with_sem
+from fightrequest import (
+    HeaderFactory,
+    fetch_with_retry,
+    byte_summary,
+)
 
 
 class FightsScraper:
     def __init__(self, config: ScrapeConfig) -> None:
         self.config = config
+        self.policy = RetryPolicy(config.max_attempts, config.retry_base_delay)
+        self.dead_letters = DeadLetters("fights")
+        self.headers = HeaderFactory.from_config(config)
 
-    async def scrape(self, urls: list[str]) -> str:
+    async def scrape_fight(self, controller, url, session, limiter) -> dict:
+        """Fetches a single fight page with retries (conditionally, when a snapshot is already saved), recording it as a dead letter if every attempt fails."""
 
-        start = time.perf_counter()
-        log_msg(f"\n[FightsScraper]: Fights Scraper has begun scraping fight URLs...\n")
+        headers = self.headers()
+        event_fight_id = await curr_event_fight_id(url)
+        if self.store.has(snapshot_key({"event_fight_id": event_fight_id})):
+            headers.update(self.journal.conditional_headers(url))
 
-        collected_fights = []
+        self.journal.start(url)
+        fight = await fetch_with_retry(
+            self.policy, controller, url, session, headers, event_fight_id, limiter
+        )
+        fight["url"] = url
+        if fight.get("content_flag") != True:
+            self.dead_letters.add(url, fight)
 
-        lst = await create_agents_list()
+        return fight
 
-        sem = asyncio.Semaphore(15)
-        conn = aiohttp.TCPConnector(limit=25)
-        async with aiohttp.ClientSession(connector=conn) as session:
-            for count, url in enumerate(urls):
+    def is_unchanged(self, fight: dict) -> bool:
+        """True if the server answered 304 or sent back a body byte-identical to the stored snapshot."""
 
-                headers = await random_header_agent(lst)
-                event_fight_id = await curr_event_fight_id(url)
+        return fight.get("not_modified") or fight.get(
+            "content_hash"
+        ) == self.store.current_hash(snapshot_key(fight))
 
-                try:
-                    fight = await fetch_with_sem(
-                        sem, url, session, headers, event_fight_id
+    def finish_saved(self, fight: dict) -> None:
+        """Journals a page's URL as done once the writer has saved and synced it, so a crash before then leaves it to be fetched again."""
+
+        self.journal.finish(fight["url"], fight)
+
+    async def feed(
+        self, frontier: asyncio.Queue, urls: list[str], stop: asyncio.Event
+    ) -> None:
+        """Puts the URLs on the frontier as the workers make room (until the crawl is stopped), then waits for the workers to finish them."""
+
+        for url in urls:
+            if stop.is_set():
+                break
+            await frontier.put(url)
+
+        await frontier.join()
+
+    async def worker(
+        self,
+        frontier: asyncio.Queue,
+        total: int,
+        session: aiohttp.ClientSession,
+        writer: SnapshotWriter,
+        stop: asyncio.Event,
+        controller: AdaptiveConcurrency,
+        limiter: RateLimiter,
+    ) -> None:
+        """Pulls URLs off the frontier and fetches them, handing each changed page to the writer."""
+
+        while True:
+            url = await frontier.get()
+            try:
+                if stop.is_set():
+                    continue
+
+                fight = await self.scrape_fight(controller, url, session, limiter)
+                event_fight_id = fight.get("event_fight_id")
+                self.done += 1
+
+                if fight.get("content_flag") == True:
+                    self.scraped += 1
+                    self.wire_bytes += fight.get("wire_bytes", 0)
+                    self.decoded_bytes += fight.get("decoded_bytes", 0)
+                    if self.is_unchanged(fight):
+                        self.unchanged += 1
+                        self.not_modified += bool(fight.get("not_modified"))
+                        self.journal.finish(url, fight)
+                        # Never handed to the writer, so its body is released here.
+                        fight["response_text"] = None
+                    else:
+                        self.changed += 1
+                        # Its URL stays in-flight until the writer has it on disk (see finish_saved).
+                        await writer.put(fight)
+                    log_msg(
+                        f"Successfully scraped event_fight_id#: {event_fight_id}... count: {self.done}/{total} ({fight.get('wire_bytes', 0)} bytes on the wire, {fight.get('decoded_bytes', 0)} decoded)"
                     )
-                    if fight.get("content_flag") == True:
-                        collected_fights.append(fight)
+                else:
+                    self.journal.finish(url, fight)
+                    fight["response_text"] = None
+                    log_msg(
+                        f"\nFailed to scraped event_fight_id#: {event_fight_id}... count: {self.done}/{total} after {fight.get('attempts')} attempts // concurrency now: {controller.limit}"
+                    )
+                    if controller.exhausted() and not stop.is_set():
                         log_msg(
-                            f"Successfully scraped event_fight_id#: {event_fight_id}... count: {count+1}/{len(urls)}"
+                            f"\n[FightsScraper]: Pages are still failing at the lowest concurrency, stopping the crawl."
                         )
-                    else:
-                        log_msg(
-                            f"\nFailed to scraped event_fight_id#: {event_fight_id}... count: {count+1}/{len(urls)}"
+                        stop.set()
+            finally:
+                frontier.task_done()
+
+    async def scrape(self, urls: list[str]) -> str:
+
+        start = time.perf_counter()
+        log_msg(f"\n[FightsScraper]: Fights Scraper has begun scraping fight URLs...\n")
+
+        self.scraped = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.not_modified = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.done = 0
+
+        self.journal = CrawlJournal(self.config.journal_file)
+        self.journal.add(urls)
+        self.store = SnapshotStore(self.config.snapshot_store_dir)
+
+        # A bounded frontier: a fixed pool of workers pulls from it while feed() tops it up, so the backlog is never held as pending tasks.
+        frontier = asyncio.Queue(maxsize=2 * self.config.max_concurrency)
+        stop = asyncio.Event()
+        controller = AdaptiveConcurrency(
+            self.config.concurrency, self.config.max_concurrency
+        )
+        limiter = RateLimiter(self.config.rate_limit, self.config.rate_burst)
+        conn = aiohttp.TCPConnector(limit=self.config.max_concurrency)
+        async with SnapshotWriter(
+            partial(save_snapshot, self.store),
+            self.store.sync,
+            on_saved=self.finish_saved,
+        ) as writer:
+            async with aiohttp.ClientSession(
+                connector=conn, auto_decompress=False
+            ) as session:
+                workers = [
+                    asyncio.create_task(
+                        self.worker(
+                            frontier,
+                            len(urls),
+                            session,
+                            writer,
+                            stop,
+                            controller,
+                            limiter,
                         )
-                        break
-                except:
-                    log_msg(
-                        f"\nevent_fight_id: {event_fight_id}, {count+1}/{len(urls)} failed to create fight >>> broken in the scrape() except: block."
                     )
-                    break
+                    for _ in range(self.config.max_concurrency)
+                ]
+                # A worker only returns by raising (e.g. the writer's error), which ends the crawl.
+                crawl = asyncio.create_task(self.feed(frontier, urls, stop))
+                try:
+                    done, _ = await asyncio.wait(
+                        (crawl, *workers), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                finally:
+                    crawl.cancel()
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(crawl, *workers, return_exceptions=True)
 
         elapsed = time.perf_counter() - start
         log_msg(
-            f"\n[FightsScraper]: Finished scraping {len(collected_fights)} fights pages: {elapsed} seconds!\n"
+            f"\n[FightsScraper]: Finished scraping {self.scraped} fights pages: {elapsed} seconds! ({controller.summary()})\n"
+        )
+
+        log_msg(
+            f"[FightsScraper]: {self.changed} pages changed, {self.unchanged} unchanged ({self.not_modified} not modified, {self.unchanged - self.not_modified} byte-identical to their snapshot)"
+        )
+
+        log_msg(
+            f"[FightsScraper]: Transferred {byte_summary(self.wire_bytes, self.decoded_bytes)}"
         )
 
-        await export_scraped_content(collected_fights)
+        self.dead_letters.save()
+        log_msg(f"[FightsScraper]: Crawl journal: {self.journal.counts()}")
+        self.journal.close()
+        self.store.close()
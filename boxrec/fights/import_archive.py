@@ -0,0 +1,31 @@
+import time
+
+from config import read_config
+from exporters import open_snapshot_store
+from log import log_msg
+from snapshotstore import import_bundle
+
+
+def main():
+
+    log_msg(
+        f"\n[START]: The '__main__' function was called >>> Fights Archive Import beginning...\n"
+    )
+
+    config = read_config("./fights-config.json")
+
+    with open_snapshot_store(config) as store:
+        imported, corrupt = import_bundle(store, config.bundle_file)
+
+    log_msg(
+        f"[Bundle]: Imported {imported} pages from {config.bundle_file}; {corrupt} pages failed their checksum and were skipped."
+    )
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    elapsed = time.perf_counter() - start
+    log_msg(
+        f"\n[EXIT]: The entire program was completed in a total of: {elapsed} seconds!\n"
+    )
@@ -0,0 +1,204 @@
+import sqlite3
+import time
+from pathlib import Path
+
+PENDING = "pending"
+IN_FLIGHT = "in-flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class CrawlJournal:
+    """SQLite journal that records the state of every URL a scraper has been asked to crawl, so a restart resumes from what is left."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.cnxn = sqlite3.connect(self.path, isolation_level=None)
+        self.cnxn.execute("PRAGMA journal_mode=WAL")
+        self.cnxn.execute("PRAGMA synchronous=NORMAL")
+        self.cnxn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url             TEXT    PRIMARY KEY,
+                state           TEXT    NOT NULL,
+                attempts        INTEGER NOT NULL DEFAULT 0,
+                last_status     INTEGER,
+                content_hash    TEXT,
+                updated_at      REAL    NOT NULL
+            )
+            """)
+        self.cnxn.execute("CREATE INDEX IF NOT EXISTS urls_state ON urls (state)")
+        self.cnxn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.cnxn.execute("""
+            CREATE TABLE IF NOT EXISTS http_cache (
+                url             TEXT    PRIMARY KEY,
+                etag            TEXT,
+                last_modified   TEXT,
+                content_hash    TEXT,
+                fetched_at      REAL    NOT NULL
+            )
+            """)
+        # URLs left in-flight by an interrupted run never finished, so they are owed another try.
+        self.cnxn.execute(
+            "UPDATE urls SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT)
+        )
+
+    def __enter__(self) -> "CrawlJournal":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.cnxn.close()
+
+    def is_seeded(self) -> bool:
+        """True once the full list of URLs to crawl has been loaded into the journal."""
+
+        return (
+            self.cnxn.execute("SELECT 1 FROM meta WHERE key = 'seeded_at'").fetchone()
+            is not None
+        )
+
+    def set_seeded(self) -> None:
+        """Records that the full list of URLs to crawl has been loaded."""
+
+        self.cnxn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('seeded_at', ?)",
+            (str(time.time()),),
+        )
+
+    def watermark(self, name: str) -> str:
+        """Returns the high-water mark last recorded under a name (e.g. the newest row already queued from a table), or None."""
+
+        row = self.cnxn.execute(
+            "SELECT value FROM meta WHERE key = ?", ("watermark:" + name,)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def set_watermark(self, name: str, value: str) -> None:
+        """Records a high-water mark under a name, so the next run only looks past it."""
+
+        self.cnxn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            ("watermark:" + name, value),
+        )
+
+    def add(self, urls: list[str], state: str = PENDING) -> None:
+        """Records new URLs with the given state; URLs already in the journal keep their current state."""
+
+        now = time.time()
+        with self.cnxn:
+            self.cnxn.execute("BEGIN")
+            self.cnxn.executemany(
+                "INSERT OR IGNORE INTO urls (url, state, updated_at) VALUES (?, ?, ?)",
+                ((url, state, now) for url in urls),
+            )
+
+    def mark(self, urls: list[str], state: str) -> None:
+        """Forces the given URLs into a state, adding any that are missing."""
+
+        now = time.time()
+        with self.cnxn:
+            self.cnxn.execute("BEGIN")
+            self.cnxn.executemany(
+                """
+                INSERT INTO urls (url, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+                """,
+                ((url, state, now) for url in urls),
+            )
+
+    def pending(self) -> list[str]:
+        """Returns every URL that still needs to be fetched."""
+
+        return [
+            row[0]
+            for row in self.cnxn.execute(
+                "SELECT url FROM urls WHERE state = ?", (PENDING,)
+            )
+        ]
+
+    def failed(self) -> list[str]:
+        """Returns every URL whose last crawl failed permanently."""
+
+        return [
+            row[0]
+            for row in self.cnxn.execute(
+                "SELECT url FROM urls WHERE state = ?", (FAILED,)
+            )
+        ]
+
+    def start(self, url: str) -> None:
+        """Marks a URL as in-flight just before it is requested."""
+
+        self.cnxn.execute(
+            """
+            INSERT INTO urls (url, state, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+            """,
+            (url, IN_FLIGHT, time.time()),
+        )
+
+    def finish(self, url: str, result: dict) -> None:
+        """Records the outcome of a URL's final request (done when its content arrived, otherwise failed) and caches its validators."""
+
+        # The hash fetch() took of the decoded body bytes, the same one the snapshot store keys pages by (None for a 304 or a failure).
+        body_hash = result.get("content_hash")
+        now = time.time()
+
+        self.cnxn.execute(
+            """
+            UPDATE urls
+            SET state = ?, attempts = attempts + ?, last_status = ?, content_hash = COALESCE(?, content_hash), updated_at = ?
+            WHERE url = ?
+            """,
+            (
+                DONE if result.get("content_flag") == True else FAILED,
+                result.get("attempts") or 1,
+                result.get("status_code"),
+                body_hash,
+                now,
+                url,
+            ),
+        )
+
+        if result.get("etag") or result.get("last_modified"):
+            self.cnxn.execute(
+                """
+                INSERT INTO http_cache (url, etag, last_modified, content_hash, fetched_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    content_hash = COALESCE(excluded.content_hash, http_cache.content_hash),
+                    fetched_at = excluded.fetched_at
+                """,
+                (url, result.get("etag"), result.get("last_modified"), body_hash, now),
+            )
+
+    def conditional_headers(self, url: str) -> dict:
+        """Returns If-None-Match/If-Modified-Since headers from the validators cached for a URL, if any."""
+
+        row = self.cnxn.execute(
+            "SELECT etag, last_modified FROM http_cache WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return {}
+
+        etag, last_modified = row
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        return headers
+
+    def counts(self) -> dict:
+        """Returns the number of URLs in each state."""
+
+        return dict(
+            self.cnxn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state")
+        )
@@ -5,7 +5,7 @@ from typing import Awaitable, Any
 from config import read_config
 from log import log_msg
 from db import get_fight_urls_not_in_db, make_new_fights_table, insert_fights_df_to_db
-from exporters import get_fight_urls_not_in_archive, save_all_fights_to_csv
+from exporters import get_fight_urls_pending, save_all_fights_to_csv
 from fightscraper import FightsScraper
 from fightparser import FightParser
 from log import log_msg
@@ -32,20 +32,21 @@ async def main():
     config = read_config("./fights-config.json")
 
     # fight_urls_rem = get_fight_urls_not_in_db(config)
-    fight_urls_rem = get_fight_urls_not_in_archive(config)
+    fight_urls_rem = get_fight_urls_pending(config)
 
     scraper = FightsScraper(config)
     await scraper.scrape(fight_urls_rem)
 
-    p = FightParser(config)
-    all_fights = await p.parse()
+    with FightParser(config) as p:
+        all_fights = await p.parse()
 
-    df = await fights_to_df(all_fights)
+        df = await fights_to_df(all_fights)
 
-    await save_all_fights_to_csv(config, all_fights)
+        await save_all_fights_to_csv(config, all_fights)
 
-    await make_new_fights_table()
-    await insert_fights_df_to_db(df)
+        await make_new_fights_table()
+        await insert_fights_df_to_db(df)
+        p.mark_parsed()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,9 @@
+from typing import Hashable, Iterable
+
+
+def pending_ids(wanted: Iterable[Hashable], done: Iterable[Hashable]) -> list:
+    """Returns the wanted IDs missing from done, once each and in wanted order; done is hashed into a set so the diff costs O(n + m) rather than O(n * m)."""
+
+    done = done if isinstance(done, (set, frozenset)) else set(done)
+
+    return [x for x in dict.fromkeys(wanted) if x not in done]
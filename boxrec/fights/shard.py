@@ -0,0 +1,29 @@
+import time
+
+from config import read_config
+from exporters import shard_archive
+from log import log_msg
+
+
+def main():
+
+    log_msg(
+        f"\n[START]: The '__main__' function was called >>> Fights Archive Sharding beginning...\n"
+    )
+
+    config = read_config("./fights-config.json")
+
+    moved, sharded = shard_archive(config)
+
+    log_msg(
+        f"[Sharding]: Moved {moved} archived fight files into shard folders and assigned shards to {sharded} cataloged pages."
+    )
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    elapsed = time.perf_counter() - start
+    log_msg(
+        f"\n[EXIT]: The entire program was completed in a total of: {elapsed} seconds!\n"
+    )
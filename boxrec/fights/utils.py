@@ -1,4 +1,14 @@
+import re
+from typing import Iterable
+
 from config import ScrapeConfig
+from log import log_msg
+from pending import pending_ids
+
+# Events per shard; fights of 1,000 consecutive events share a shard folder.
+SHARD_SPAN = 1000
+# A well-formed 'event_fight_id': the event ID and the fight ID, both numeric.
+EVENT_FIGHT_ID = re.compile(r"\d+/\d+")
 
 
 def build_next_url(config: ScrapeConfig, event_fight_id: str) -> str:
@@ -8,6 +18,37 @@ def build_next_url(config: ScrapeConfig, event_fight_id: str) -> str:
     return url
 
 
+def fight_id(event_fight_id: str) -> int:
+    """Returns the integer fight ID that ends an 'event_fight_id' (event/fight)."""
+
+    return int(event_fight_id.split("/")[1])
+
+
+def fight_shard(event_fight_id: str) -> str:
+    """Returns the shard a fight is filed under: the zero-padded thousands prefix of its event ID, so shards sort in event order."""
+
+    return f"{int(event_fight_id.split('/')[0]) // SHARD_SPAN:05d}"
+
+
+def well_formed_fight_ids(event_fight_ids: Iterable[str]) -> list[str]:
+    """Returns the given 'event_fight_id's that are well formed, logging and skipping the rest (e.g. the "" a fight snippet without an event link defaults to)."""
+
+    well_formed = []
+    for x in event_fight_ids:
+        if isinstance(x, str) and EVENT_FIGHT_ID.fullmatch(x):
+            well_formed.append(x)
+        else:
+            log_msg(f"Skipped malformed event_fight_id: {x!r}")
+
+    return well_formed
+
+
+def pending_fights(wanted: Iterable[str], done: Iterable[str]) -> dict[int, str]:
+    """Maps the fight ID of every well-formed wanted 'event_fight_id' missing from done to its 'event_fight_id', in wanted order."""
+
+    return {fight_id(x): x for x in well_formed_fight_ids(pending_ids(wanted, done))}
+
+
 async def curr_event_fight_id(url: str) -> str:
 
     return url.split("t/")[1].strip()
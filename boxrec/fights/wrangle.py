@@ -3,16 +3,33 @@ import time
 
 import pandas as pd
 import warnings
-from bs4 import BeautifulSoup as bs
+from bs4 import BeautifulSoup as bs, SoupStrainer
+from bs4.builder import builder_registry
 
 from fight import Fight
 from log import log_msg
 
+# The only parts of a fight page extract_fight reads: the bout column (date and division headers, venue, scorecard table) and the title banner.
+FIGHT_PAGE_PARTS = SoupStrainer("div", class_=["singleColumn", "titleColor"])
 
-async def create_soup(response_text: str) -> bs:
-    """Returns response.text as BeautifulSoup object."""
 
-    return bs(response_text, "html.parser")
+def soup_backend(name: str) -> str:
+    """Returns the BeautifulSoup tree builder to parse with: the configured one (e.g. the C-accelerated "lxml") when it is installed, else the pure-Python "html.parser"."""
+
+    return name if builder_registry.lookup(name) is not None else "html.parser"
+
+
+async def create_soup(
+    response_text: str | bytes,
+    features: str = "html.parser",
+    parse_only: SoupStrainer = None,
+) -> bs:
+    """Returns response.text, or the raw bytes of a saved snapshot, as BeautifulSoup object built with the given tree builder; given parse_only, only the matching parts of the page are built."""
+
+    if isinstance(response_text, bytes):
+        return bs(response_text, features, parse_only=parse_only, from_encoding="utf-8")
+
+    return bs(response_text, features, parse_only=parse_only)
 
 
 def clean_str(text: str) -> str:
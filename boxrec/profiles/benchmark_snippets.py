@@ -0,0 +1,194 @@
+import asyncio
+import re
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from config import read_config
+from fightsnipsparser import FightSnippetExtractor, FightSnippetsParser
+from fightsnippet import FightSnippet, from_dict_to_dataclass
+from log import log_msg
+from transform import create_soup, soup_backend, clean_str, convert_to_float
+
+# Bouts to time; the longest career in the store is used, and a career page split over several parts is measured as one.
+CAREER_BOUTS = 300
+# Timed passes per extractor; the fastest is reported, so one noisy pass does not skew the comparison.
+ROUNDS = 5
+
+
+class RepeatedLookupsExtractor(FightSnippetExtractor):
+    """The fight snippet extractor as it was before each row's anchors and cells were located once: every field re-runs its own find_all (compiling its href pattern again), kept here as the benchmark baseline."""
+
+    async def extract_snip(self, snip_top) -> FightSnippet:
+
+        snip_dict = {}
+
+        if len(snip_top.get("id")) > 0:
+            snip_dict["fsnip_fight_id"] = int(clean_str(snip_top.get("id")))
+
+        if len(snip_top.find_all("a", href=re.compile("date"))) > 0:
+            snip_dict["fsnip_fight_date"] = datetime.strptime(
+                clean_str(snip_top.find_all("a", href=re.compile("date"))[-1].text),
+                "%Y-%m-%d",
+            ).date()
+
+        if len(snip_top.select("td:nth-child(3)")) == 1:
+            try:
+                snip_dict["fsnip_boxer_weighin_weight"] = convert_to_float(
+                    clean_str(snip_top.select_one("td:nth-child(3)").text)
+                )
+            except:
+                pass
+
+        if len(snip_top.find_all("a", href=re.compile("proboxer"))) > 0:
+            snip_dict["fsnip_opp_name"] = clean_str(
+                snip_top.find_all("a", href=re.compile("proboxer"))[-1].text
+            )
+
+        if len(snip_top.find_all("a", href=re.compile("proboxer"))) > 0:
+            snip_dict["fsnip_br_opp_id"] = int(
+                clean_str(
+                    snip_top.find_all("a", href=re.compile("proboxer"))[-1]
+                    .get("href")
+                    .split("r/")[1]
+                )
+            )
+
+        if bool(snip_top.find("a", href=re.compile("proboxer"))):
+            try:
+                snip_dict["fsnip_opp_weighin_weight"] = convert_to_float(
+                    clean_str(
+                        snip_top.find(
+                            "a", href=re.compile("proboxer")
+                        ).parent.next_sibling.text
+                    )
+                )
+            except:
+                pass
+
+        if len(snip_top.find_all("div", {"class": "boutResult"})) > 0:
+            snip_dict["fsnip_fight_result"] = clean_str(
+                snip_top.find_all("div", {"class": "boutResult"})[0].text
+            )
+
+        if len(snip_top.find_all("div", {"class": "boutResult"})) > 0:
+            snip_dict["fsnip_fight_result_type"] = clean_str(
+                snip_top.find_all("div", {"class": "boutResult"})[
+                    0
+                ].parent.next_sibling.text
+            )
+
+        if len(snip_top.find_all("div", {"class": "boutResult"})) > 0:
+            try:
+                snip_dict["fsnip_fight_rounds_completed"] = int(
+                    clean_str(
+                        snip_top.find_all("div", {"class": "boutResult"})[
+                            0
+                        ].parent.next_sibling.next_sibling.text.split("/")[0]
+                    )
+                )
+            except:
+                pass
+
+        if len(snip_top.find_all("div", {"class": "boutResult"})) > 0:
+            try:
+                snip_dict["fsnip_fight_rounds_scheduled"] = int(
+                    clean_str(
+                        snip_top.find_all("div", {"class": "boutResult"})[
+                            0
+                        ].parent.next_sibling.next_sibling.text.split("/")[1]
+                    )
+                )
+            except:
+                pass
+
+        if len(snip_top.find_all("a", href=re.compile("event"))) > 0:
+            snip_dict["fsnip_event_fight_id"] = clean_str(
+                snip_top.find_all("a", href=re.compile("event"))[-1]
+                .get("href")
+                .split("t/")[1]
+            )
+
+        return from_dict_to_dataclass(FightSnippet, snip_dict)
+
+
+async def career_rows(features: str, pages: list) -> list:
+    """Parses the given career pages and returns their fight snippet rows, up to CAREER_BOUTS."""
+
+    rows = []
+    for page in pages:
+        soup = await create_soup(page, features)
+        rows.extend(soup.find_all("tr", {"class": "drawRowBorder"}))
+
+    return rows[:CAREER_BOUTS]
+
+
+async def longest_career(config) -> tuple[str, list]:
+    """Returns the boxer ID and page bodies of the longest career in the snapshot store."""
+
+    with FightSnippetsParser(config) as parser:
+        bouts = defaultdict(int)
+        for entry, read in parser.files:
+            bouts[entry["ident"]] += read().count(b"drawRowBorder")
+
+        boxrec_id = max(bouts, key=bouts.get)
+
+        return boxrec_id, [
+            read() for entry, read in parser.files if entry["ident"] == boxrec_id
+        ]
+
+
+async def time_rows(extractor, rows: list) -> tuple[list, float]:
+    """Extracts every row ROUNDS times, returning the snippets and the fastest pass in seconds."""
+
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        snippets = [await extractor.extract_snip(row) for row in rows]
+        best = min(best, time.perf_counter() - start)
+
+    return snippets, best
+
+
+async def main():
+
+    log_msg(
+        f"\n[START]: The '__main__' function was called >>> Fight Snippets Extraction Benchmark beginning...\n"
+    )
+
+    config = read_config("./profile-config.json")
+
+    # A saved career page can be given instead, e.g. to compare runs on the same page across machines.
+    if len(sys.argv) > 1:
+        source, pages = sys.argv[1], [open(sys.argv[1], "rb").read()]
+    else:
+        boxrec_id, pages = await longest_career(config)
+        source = f"boxer-ID#: {boxrec_id}"
+
+    features = soup_backend(config.html_parser)
+    rows = await career_rows(features, pages)
+    if not rows:
+        log_msg(f"[Benchmark]: No fight snippets found to time.")
+        return
+
+    baseline = RepeatedLookupsExtractor(features)
+    current = FightSnippetExtractor(features)
+
+    expected, baseline_time = await time_rows(baseline, rows)
+    actual, current_time = await time_rows(current, rows)
+
+    log_msg(
+        f"[Benchmark]: {len(rows)} bouts ({source}, {features}): repeated lookups {baseline_time * 1000:.1f} ms ({baseline_time / len(rows) * 1e6:.0f} us/row), one-pass lookups {current_time * 1000:.1f} ms ({current_time / len(rows) * 1e6:.0f} us/row), {baseline_time / current_time:.1f}x faster."
+    )
+    if expected != actual:
+        log_msg(f"[Benchmark]: The extractors disagree on this career's snippets!")
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - start
+    log_msg(
+        f"\n[EXIT]: The entire program was completed in a total of: {elapsed} seconds!\n"
+    )
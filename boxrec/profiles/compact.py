@@ -0,0 +1,33 @@
+import time
+
+from config import read_config
+from export import open_snapshot_store
+from log import log_msg
+
+
+def main():
+
+    log_msg(
+        f"\n[START]: The '__main__' function was called >>> Profiles Snapshot Compaction beginning...\n"
+    )
+
+    config = read_config("./profile-config.json")
+
+    with open_snapshot_store(config) as store:
+        report = store.compact(config.keep_versions)
+
+    log_msg(
+        f"[Compaction]: Packed {report['packed']} loose files, dropped {report['dropped_versions']} old versions (keeping {config.keep_versions} per page) and {report['corrupt']} corrupt blobs."
+    )
+    log_msg(
+        f"[Compaction]: {report['bytes_before'] / 1_048_576:.2f} MB before, {report['bytes_after'] / 1_048_576:.2f} MB after, {report['reclaimed_bytes'] / 1_048_576:.2f} MB reclaimed."
+    )
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    elapsed = time.perf_counter() - start
+    log_msg(
+        f"\n[EXIT]: The entire program was completed in a total of: {elapsed} seconds!\n"
+    )
@@ -1,5 +1,6 @@
 import pyodbc
 import time
+from datetime import datetime
 
 import pandas as pd
 import sqlalchemy
@@ -239,14 +240,48 @@ class SQLServer:
         return logging.info(self.cnxn.cursor.fetchall())
 
 
+def get_boxer_ids_from_ratings() -> list[int]:
+    """A query that selects [br_boxer_id] from the [ratings] table as integers."""
+
+    with SQLServer(DRIVER) as cursor:
+        cursor.execute("SELECT [br_boxer_id] FROM [BoxingTestDB].[dbo].[ratings]")
+        a = cursor.fetchall()
+
+    return [int(i[0]) for i in a]
+
+
 def get_profile_urls_from_ratings(config: ScrapeConfig):
     """A query that selects [br_boxer_id] from the [ratings] table."""
 
+    return [config.root_url + str(i) for i in get_boxer_ids_from_ratings()]
+
+
+def get_new_boxer_ids_from_ratings(
+    since: datetime = None,
+) -> tuple[list[int], datetime]:
+    """A query that selects [br_boxer_id] as integers from the [ratings] rows uploaded after since (all rows when since is None), with the newest upload date read."""
+
     with SQLServer(DRIVER) as cursor:
-        cursor.execute("SELECT [br_boxer_id] FROM [BoxingTestDB].[dbo].[ratings]")
+        cursor.execute("SELECT MAX([upload_date]) FROM [BoxingTestDB].[dbo].[ratings]")
+        latest = cursor.fetchone()[0]
+        if latest is None or (since is not None and latest <= since):
+            return [], since
+
+        # Bounded by latest, so rows uploaded while this runs are left for the next mark.
+        if since is None:
+            cursor.execute(
+                "SELECT [br_boxer_id] FROM [BoxingTestDB].[dbo].[ratings] WHERE [upload_date] <= ?",
+                latest,
+            )
+        else:
+            cursor.execute(
+                "SELECT [br_boxer_id] FROM [BoxingTestDB].[dbo].[ratings] WHERE [upload_date] > ? AND [upload_date] <= ?",
+                since,
+                latest,
+            )
         a = cursor.fetchall()
 
-    return [config.root_url + str(i[0]) for i in a]
+    return [int(i[0]) for i in a], latest
 
 
 def query_saved_boxer_ratings_100(config: ScrapeConfig):
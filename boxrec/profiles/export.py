@@ -2,7 +2,8 @@ import time
 import asyncio
 from datetime import datetime
 import csv
-import pathlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
 import pandas as pd
 
@@ -10,43 +11,148 @@ from config import ScrapeConfig
 from profile import BoxerProfile
 from fightsnippet import FightSnippet
 from log import log_msg
+from snapshotstore import SnapshotStore, sync_catalog
 
+SNAPSHOT_KIND = "profiles"
 
-async def export_scraped_content(collected_profiles: list[str]) -> None:
-    """Saves html scraped from collected_profiles pages to a locally accessible directory."""
 
-    start = time.perf_counter()
+def snapshot_key(profile: dict) -> str:
+    """Returns the snapshot store key a scraped profile page is saved under, suffixed by its career page offset."""
+
+    boxrec_id = profile.get("boxrec_id")
+    url_string = profile.get("url_string")
+
+    if "?&offset=100" in url_string:
+        return f"id-{boxrec_id}-1"
+    elif "?&offset=200" in url_string:
+        return f"id-{boxrec_id}-2"
+
+    return f"id-{boxrec_id}"
+
+
+def describe_snapshot(key: str) -> tuple[str, str, int, str]:
+    """Returns the catalog (kind, ident, part, shard) of a profile snapshot key, where part is the career page offset (profiles are not sharded), or None if the key is not a profile page."""
+
+    if not key.startswith("id-"):
+        return None
+
+    boxrec_id, _, part = key.split("id-")[1].partition("-")
+
+    return SNAPSHOT_KIND, boxrec_id, int(part or 0), None
+
+
+def save_snapshot(store: SnapshotStore, profile: dict) -> None:
+    """Saves html scraped from a single profile page to the snapshot store."""
+
+    boxrec_id = profile.get("boxrec_id")
+    key = snapshot_key(profile)
+
+    try:
+        store.put(
+            key,
+            profile.get("response_text"),
+            profile.get("url_string"),
+            *describe_snapshot(key),
+        )
+    except UnicodeEncodeError:
+        log_msg(f"id: {boxrec_id}, did not have the proper encoding and was skipped")
+
+
+def open_snapshot_store(config: ScrapeConfig) -> SnapshotStore:
+    """Opens the snapshot store, registering the legacy snapshots folder and profiles archive directory with its catalog on first use."""
 
-    scrape_output_dir = pathlib.Path().resolve() / "snapshots"
-    scrape_output_dir.mkdir(parents=True, exist_ok=True)
+    store = SnapshotStore(config.snapshot_store_dir)
+    sync_catalog(store, "snapshots", describe_snapshot)
+    sync_catalog(store, config.collected_profiles_dir, describe_snapshot)
 
-    for count, profile in enumerate(collected_profiles):
-        boxrec_id = profile.get("boxrec_id")
-        response_text = profile.get("response_text")
-        url_string = profile.get("url_string")
+    return store
 
-        if "?" and "100" in url_string:
-            output_file = scrape_output_dir / f"id-{boxrec_id}-1.html"
-        elif "?" and "200" in url_string:
-            output_file = scrape_output_dir / f"id-{boxrec_id}-2.html"
-        else:
-            output_file = scrape_output_dir / f"id-{boxrec_id}.html"
 
+class SnapshotWriter:
+    """Saves scraped pages from a bounded queue on a dedicated writer thread, in batches that are synced to disk once each, so disk latency never holds up the event loop."""
+
+    def __init__(
+        self,
+        save: Callable[[dict], None],
+        sync: Callable[[], None] = None,
+        maxsize: int = 100,
+        batch_size: int = 25,
+        on_saved: Callable[[dict], None] = None,
+    ) -> None:
+        self.save = save
+        self.sync = sync
+        # Called (on the event loop) for each page once its batch is saved and synced, e.g. to journal its URL as done.
+        self.on_saved = on_saved
+        self.queue = asyncio.Queue(maxsize)
+        self.batch_size = batch_size
+        # One thread keeps appends to the open segment in arrival order.
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="snapshot-writer")
+        self.saved = 0
+
+    async def __aenter__(self) -> "SnapshotWriter":
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
         try:
-            output_file.write_text(response_text, encoding="utf-8")
-            log_msg(
-                f"Saved {count+1}/{len(collected_profiles)} html files... page#: {boxrec_id} // output file: {output_file}"
-            )
-        except:
-            log_msg(
-                f"id: {boxrec_id}, did not have the proper encoding and was skipped"
-            )
-            continue
+            await self.put(None)
+            await self.task
+        finally:
+            self.executor.shutdown()
 
-    elapsed = time.perf_counter() - start
-    log_msg(
-        f"\n[ProfilesExport]: Profiles Scraper has saved the available ratings page html bodies: {elapsed} seconds!\n"
-    )
+    def check(self) -> None:
+        """Re-raises the error that stopped the writer task, if it has stopped."""
+
+        if self.task.done():
+            self.task.result()
+            raise RuntimeError("The snapshot writer has stopped.")
+
+    async def put(self, page: dict) -> None:
+        """Hands a fetched page to the writer, waiting if the queue is full; raises the writer's error instead if it stops (e.g. the disk is full), so a crawl can never wait on a dead writer."""
+
+        self.check()
+        put = asyncio.create_task(self.queue.put(page))
+        try:
+            await asyncio.wait((put, self.task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stuck = not put.done()
+            put.cancel()
+        if stuck:
+            self.check()
+
+    def save_batch(self, pages: list[dict]) -> None:
+        """Saves a batch of pages and syncs them to disk together (runs on the writer thread)."""
+
+        for page in pages:
+            self.save(page)
+        if self.sync is not None:
+            self.sync()
+
+        log_msg(f"Saved {len(pages)} snapshots... total: {self.saved + len(pages)}")
+
+    async def run(self) -> None:
+        """Writes queued pages in batches (whatever has queued up while the last batch was written) until the closing sentinel arrives."""
+
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            pages = [await self.queue.get()]
+            while len(pages) < self.batch_size and not self.queue.empty():
+                pages.append(self.queue.get_nowait())
+
+            closing = pages[-1] is None
+            pages = [page for page in pages if page is not None]
+            if not pages:
+                continue
+
+            await loop.run_in_executor(self.executor, self.save_batch, pages)
+            if self.on_saved is not None:
+                for page in pages:
+                    self.on_saved(page)
+            # Release the bodies once they are on disk so memory stays flat for the rest of the crawl.
+            for page in pages:
+                page["response_text"] = None
+            self.saved += len(pages)
 
 
 async def save_df_to_csv(config: ScrapeConfig, df: pd.DataFrame) -> None:
@@ -160,7 +266,7 @@ async def save_all_fightsnips_to_csv(
                             snip.fsnip_opp_name,
                             snip.fsnip_opp_weighin_weight,
                             snip.fsnip_fight_rounds_completed,
-                            snip.fsnip_fight_rounds_scheduled
+                            snip.fsnip_fight_rounds_scheduled,
                             # snip.fsnip_fight_stoppage_round_time
                         ]
                     )
@@ -5,35 +5,35 @@ from datetime import date, datetime
 import re
 import time
 
-from bs4 import BeautifulSoup as bs
+from bs4 import BeautifulSoup as bs, SoupStrainer
 from typing import Any
 
 from config import ScrapeConfig
 from log import log_msg
+from snapshotstore import SnapshotBundle, snapshot_documents
+from export import SNAPSHOT_KIND, open_snapshot_store
 from fightsnippet import FightSnippet, from_dict_to_dataclass
-from transform import create_soup, clean_str, rekey, convert_to_float
-from urls import get_br_id_from_file
+from transform import (
+    PROFILE_PAGE_PARTS,
+    create_soup,
+    soup_backend,
+    clean_str,
+    rekey,
+    convert_to_float,
+)
 
+# The hrefs that mark a snippet row's date, opponent and event anchors; compiled once for every row of every career.
+DATE_HREF = re.compile("date")
+PROBOXER_HREF = re.compile("proboxer")
+EVENT_HREF = re.compile("event")
 
-class FightSnippetsParser:
-    def __init__(self, config: ScrapeConfig) -> None:
-        self.config = config
-        self.files = self.mount_files()
-        self.archived = self.mount_archived()
-
-    def mount_files(self) -> list[Path]:
-
-        directory = "snapshots"
-        files = list(Path(directory).glob("*"))
-
-        return files
-
-    def mount_archived(self) -> Path:
 
-        directory = self.config.collected_profiles_dir
-        files = list(Path(directory).glob("*"))
+class FightSnippetExtractor:
+    """Extracts the FightSnippets from a career page; it holds no store or catalog, so ProfilePagesParser can share it."""
 
-        return files
+    def __init__(self, features: str, parse_only: SoupStrainer = None) -> None:
+        self.features = features
+        self.parse_only = parse_only
 
     def add_boxer_name(self, h1_tags: bs, snip_dict: dict) -> None:
 
@@ -58,107 +58,83 @@ class FightSnippetsParser:
         if len(snippet.get("id")) > 0:
             snip_dict["fsnip_fight_id"] = int(clean_str(snippet.get("id")))
 
-    def add_snip_fight_date(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_fight_date(self, date_links: list[bs], snip_dict: dict) -> None:
 
-        if len(snippet.find_all("a", href=re.compile("date"))) > 0:
+        if len(date_links) > 0:
             snip_dict["fsnip_fight_date"] = datetime.strptime(
-                clean_str(snippet.find_all("a", href=re.compile("date"))[-1].text),
+                clean_str(date_links[-1].text),
                 "%Y-%m-%d",
             ).date()
 
-    def add_snip_boxer_weighin_weight(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_boxer_weighin_weight(
+        self, weight_cells: list[bs], snip_dict: dict
+    ) -> None:
 
-        if len(snippet.select("td:nth-child(3)")) == 1:
+        if len(weight_cells) == 1:
             try:
                 snip_dict["fsnip_boxer_weighin_weight"] = convert_to_float(
-                    clean_str(snippet.select_one("td:nth-child(3)").text)
+                    clean_str(weight_cells[0].text)
                 )
             except:
                 pass
 
-    def add_snip_opponent_name(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_opponent_name(self, boxer_links: list[bs], snip_dict: dict) -> None:
 
-        if len(snippet.find_all("a", href=re.compile("proboxer"))) > 0:
-            snip_dict["fsnip_opp_name"] = clean_str(
-                snippet.find_all("a", href=re.compile("proboxer"))[-1].text
-            )
+        if len(boxer_links) > 0:
+            snip_dict["fsnip_opp_name"] = clean_str(boxer_links[-1].text)
 
-    def add_snip_opponent_id(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_opponent_id(self, boxer_links: list[bs], snip_dict: dict) -> None:
 
-        if len(snippet.find_all("a", href=re.compile("proboxer"))) > 0:
+        if len(boxer_links) > 0:
             snip_dict["fsnip_br_opp_id"] = int(
-                clean_str(
-                    snippet.find_all("a", href=re.compile("proboxer"))[-1]
-                    .get("href")
-                    .split("r/")[1]
-                )
+                clean_str(boxer_links[-1].get("href").split("r/")[1])
             )
 
-    def add_snip_opponent_weighin_weight(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_opponent_weighin_weight(
+        self, boxer_links: list[bs], snip_dict: dict
+    ) -> None:
 
-        if bool(snippet.find("a", href=re.compile("proboxer"))):
+        if len(boxer_links) > 0:
             try:
                 snip_dict["fsnip_opp_weighin_weight"] = convert_to_float(
-                    clean_str(
-                        snippet.find(
-                            "a", href=re.compile("proboxer")
-                        ).parent.next_sibling.text
-                    )
+                    clean_str(boxer_links[0].parent.next_sibling.text)
                 )
             except:
                 pass
 
-    def add_snip_fight_result(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_fight_result(self, bout_result: bs, snip_dict: dict) -> None:
 
-        if len(snippet.find_all("div", {"class": "boutResult"})) > 0:
-            snip_dict["fsnip_fight_result"] = clean_str(
-                snippet.find_all("div", {"class": "boutResult"})[0].text
-            )
+        if bout_result is not None:
+            snip_dict["fsnip_fight_result"] = clean_str(bout_result.text)
 
-    def add_snip_fight_result_type(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_fight_result_type(self, bout_result: bs, snip_dict: dict) -> None:
 
-        if len(snippet.find_all("div", {"class": "boutResult"})) > 0:
+        if bout_result is not None:
             snip_dict["fsnip_fight_result_type"] = clean_str(
-                snippet.find_all("div", {"class": "boutResult"})[
-                    0
-                ].parent.next_sibling.text
+                bout_result.parent.next_sibling.text
             )
 
-    def add_snip_fight_rounds_completed(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_fight_rounds(self, bout_result: bs, snip_dict: dict) -> None:
 
-        if len(snippet.find_all("div", {"class": "boutResult"})) > 0:
+        if bout_result is not None:
             try:
-                snip_dict["fsnip_fight_rounds_completed"] = int(
-                    clean_str(
-                        snippet.find_all("div", {"class": "boutResult"})[
-                            0
-                        ].parent.next_sibling.next_sibling.text.split("/")[0]
-                    )
-                )
+                rounds = bout_result.parent.next_sibling.next_sibling.text.split("/")
+            except:
+                return
+            try:
+                snip_dict["fsnip_fight_rounds_completed"] = int(clean_str(rounds[0]))
             except:
                 pass
-
-    def add_snip_fight_rounds_scheduled(self, snippet: bs, snip_dict: dict) -> None:
-
-        if len(snippet.find_all("div", {"class": "boutResult"})) > 0:
             try:
-                snip_dict["fsnip_fight_rounds_scheduled"] = int(
-                    clean_str(
-                        snippet.find_all("div", {"class": "boutResult"})[
-                            0
-                        ].parent.next_sibling.next_sibling.text.split("/")[1]
-                    )
-                )
+                snip_dict["fsnip_fight_rounds_scheduled"] = int(clean_str(rounds[1]))
             except:
                 pass
 
-    def add_snip_event_fight_id(self, snippet: bs, snip_dict: dict) -> None:
+    def add_snip_event_fight_id(self, event_links: list[bs], snip_dict: dict) -> None:
 
-        if len(snippet.find_all("a", href=re.compile("event"))) > 0:
+        if len(event_links) > 0:
             snip_dict["fsnip_event_fight_id"] = clean_str(
-                snippet.find_all("a", href=re.compile("event"))[-1]
-                .get("href")
-                .split("t/")[1]
+                event_links[-1].get("href").split("t/")[1]
             )
 
     def add_boxer_name2(self, h1_tags: bs) -> str:
@@ -185,38 +161,100 @@ class FightSnippetsParser:
 
         snip_bot = snip_top.next_sibling
 
+        # Every anchor and cell the fields are read from is located once per row.
+        links = snip_top.find_all("a", href=True)
+        date_links = [a for a in links if DATE_HREF.search(a["href"])]
+        boxer_links = [a for a in links if PROBOXER_HREF.search(a["href"])]
+        event_links = [a for a in links if EVENT_HREF.search(a["href"])]
+        weight_cells = snip_top.select("td:nth-child(3)")
+        bout_result = snip_top.find("div", {"class": "boutResult"})
+
         self.add_snip_fight_id(snip_top, snip_dict)
-        self.add_snip_fight_date(snip_top, snip_dict)
-        self.add_snip_boxer_weighin_weight(snip_top, snip_dict)
-        self.add_snip_opponent_name(snip_top, snip_dict)
-        self.add_snip_opponent_id(snip_top, snip_dict)
-        self.add_snip_opponent_weighin_weight(snip_top, snip_dict)
-        self.add_snip_fight_result(snip_top, snip_dict)
-        self.add_snip_fight_result_type(snip_top, snip_dict)
-        self.add_snip_fight_rounds_completed(snip_top, snip_dict)
-        self.add_snip_fight_rounds_scheduled(snip_top, snip_dict)
-        self.add_snip_event_fight_id(snip_top, snip_dict)
+        self.add_snip_fight_date(date_links, snip_dict)
+        self.add_snip_boxer_weighin_weight(weight_cells, snip_dict)
+        self.add_snip_opponent_name(boxer_links, snip_dict)
+        self.add_snip_opponent_id(boxer_links, snip_dict)
+        self.add_snip_opponent_weighin_weight(boxer_links, snip_dict)
+        self.add_snip_fight_result(bout_result, snip_dict)
+        self.add_snip_fight_result_type(bout_result, snip_dict)
+        self.add_snip_fight_rounds(bout_result, snip_dict)
+        self.add_snip_event_fight_id(event_links, snip_dict)
 
         return from_dict_to_dataclass(FightSnippet, snip_dict)
 
     async def extract_snippets(self, response_text: str) -> list[FightSnippet]:
 
-        soup = await create_soup(response_text)
+        soup = await create_soup(response_text, self.features, self.parse_only)
+
+        return await self.extract_snippets_from_soup(soup)
+
+    async def extract_snippets_from_soup(
+        self, soup: bs, boxer_name: str = None, br_boxer_id: int = None
+    ) -> list[FightSnippet]:
+        """Extracts every fight snippet on a parsed career page; the boxer's name and ID are read from the page's h1/h2 tags unless already known (e.g. from its profile)."""
 
-        h1_tags = soup.find_all("h1")
-        h2_tags = soup.find_all("h2")
         snip_tops = [x for x in soup.find_all("tr", {"class": "drawRowBorder"})]
 
+        if snip_tops and boxer_name is None:
+            boxer_name = self.add_boxer_name2(soup.find_all("h1"))
+        if snip_tops and br_boxer_id is None:
+            br_boxer_id = self.add_boxer_boxrec_id2(soup.find_all("h2"))
+
         all_snips = []
 
         for count, snip_top in enumerate(snip_tops):
             snip = await self.extract_snip(snip_top)
-            snip.boxer_name = self.add_boxer_name2(h1_tags)
-            snip.br_boxer_id = self.add_boxer_boxrec_id2(h2_tags)
+            snip.boxer_name = boxer_name
+            snip.br_boxer_id = br_boxer_id
             all_snips.append(snip)
 
         return all_snips
 
+
+class FightSnippetsParser(FightSnippetExtractor):
+    def __init__(self, config: ScrapeConfig) -> None:
+        super().__init__(
+            soup_backend(config.html_parser),
+            PROFILE_PAGE_PARTS if config.targeted_parsing else None,
+        )
+        self.config = config
+        self.store = open_snapshot_store(config)
+        # With skip_unchanged, only pages whose content changed since the last mark_parsed() are read.
+        self.since = (
+            self.store.watermark(type(self).__name__) if config.skip_unchanged else None
+        )
+        self.cataloged_at = time.time()
+        self.files = self.mount_catalog()
+
+    def mount_catalog(self) -> list:
+
+        # With parse_from_bundle, pages are read in place from an exported bundle instead of the store.
+        self.source = (
+            SnapshotBundle(self.config.bundle_file)
+            if self.config.parse_from_bundle
+            else self.store
+        )
+
+        return snapshot_documents(self.source, SNAPSHOT_KIND, self.since)
+
+    def mark_parsed(self) -> None:
+        """Records that every page in this parser's catalog has been parsed and loaded, so a later skip_unchanged run starts after them."""
+
+        self.store.set_watermark(type(self).__name__, self.cataloged_at)
+
+    def __enter__(self) -> "FightSnippetsParser":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the bundle the catalog was read from (if any) and the snapshot store."""
+
+        if self.source is not self.store:
+            self.source.close()
+        self.store.close()
+
     async def parse(self) -> list[FightSnippet]:
 
         start = time.perf_counter()
@@ -225,23 +263,22 @@ class FightSnippetsParser:
 
         files = self.files
 
-        for count, file in enumerate(files):
-            with open(file, "r", encoding="utf-8") as f:
-                response_text = f.read()
-
-                boxrec_id = await get_br_id_from_file(file)
-
-                try:
-                    career = await self.extract_snippets(response_text)
-                    all_fightsnips.append(career)
-                    log_msg(
-                        f"Fight Snips Parser extracted data from html file: {count+1}/{len(list(files))}... boxer-ID#: {boxrec_id}"
-                    )
-                except:
-                    log_msg(
-                        f"Parsing did NOT complete for fightsnip file: {count+1}/{len(list(files))}... boxer-ID#: {boxrec_id}"
-                    )
-                    continue
+        for count, (entry, read) in enumerate(files):
+            response_text = read()
+
+            boxrec_id = entry["ident"]
+
+            try:
+                career = await self.extract_snippets(response_text)
+                all_fightsnips.append(career)
+                log_msg(
+                    f"Fight Snips Parser extracted data from html file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                )
+            except:
+                log_msg(
+                    f"Parsing did NOT complete for fightsnip file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                )
+                continue
 
         elapsed = time.perf_counter() - start
         log_msg(
@@ -4,10 +4,9 @@ from typing import Awaitable, Any
 
 from config import read_config
 from profilesscraper import ProfilesScraper
-from profilesparser import ProfilesParser
-from fightsnipsparser import FightSnippetsParser
+from profilepagesparser import ProfilePagesParser
 from log import log_msg
-from urls import get_profile_urls_rem, get_files, top_hundred_profile_urls
+from urls import get_profile_urls_pending, get_files, top_hundred_profile_urls
 from transform import profiles_to_df, fightsnips_to_df
 from export import save_df_to_csv, save_all_profiles_to_csv, save_all_fightsnips_to_csv
 from db import (
@@ -40,27 +39,26 @@ async def main():
 
     urls_100 = await top_hundred_profile_urls(config)
 
-    profile_urls_rem = get_profile_urls_rem(config)
+    profile_urls_rem = get_profile_urls_pending(config)
 
     scraper = ProfilesScraper(config)
     await scraper.scrape(urls_100)
 
-    pp = ProfilesParser(config)
-    all_profiles = await pp.parse()
+    with ProfilePagesParser(config) as pp:
+        all_profiles, all_fightsnips = await pp.parse()
 
-    cp = FightSnippetsParser(config)
-    all_fightsnips = await cp.parse()
+        df_profiles = await profiles_to_df(all_profiles)
+        df_fightsnips = await fightsnips_to_df(all_fightsnips)
 
-    df_profiles = await profiles_to_df(all_profiles)
-    df_fightsnips = await fightsnips_to_df(all_fightsnips)
+        await save_all_profiles_to_csv(config, all_profiles)
+        await save_all_fightsnips_to_csv(config, all_fightsnips)
 
-    await save_all_profiles_to_csv(config, all_profiles)
-    await save_all_fightsnips_to_csv(config, all_fightsnips)
+        await new_profiles_table()
+        await new_fight_snips_table()
+        await insert_profiles_to_db(df_profiles)
+        await insert_fightsnips_to_db(df_fightsnips)
 
-    await new_profiles_table()
-    await new_fight_snips_table()
-    await insert_profiles_to_db(df_profiles)
-    await insert_fightsnips_to_db(df_fightsnips)
+        pp.mark_parsed()
 
 
 if __name__ == "__main__":
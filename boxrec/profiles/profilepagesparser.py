@@ -0,0 +1,121 @@
+import time
+
+from config import ScrapeConfig
+from log import log_msg
+from snapshotstore import SnapshotBundle, snapshot_documents
+from export import SNAPSHOT_KIND, open_snapshot_store
+from profile import BoxerProfile
+from fightsnippet import FightSnippet
+from profilesparser import ProfileExtractor
+from fightsnipsparser import FightSnippetExtractor
+from transform import PROFILE_PAGE_PARTS, create_soup, soup_backend, clean_str
+
+
+class ProfilePagesParser:
+    """Parses each profile page once, extracting both its BoxerProfile and its FightSnippets from the same soup."""
+
+    def __init__(self, config: ScrapeConfig) -> None:
+        self.config = config
+        self.features = soup_backend(config.html_parser)
+        self.parse_only = PROFILE_PAGE_PARTS if config.targeted_parsing else None
+        self.store = open_snapshot_store(config)
+        # With skip_unchanged, only pages whose content changed since the last mark_parsed() are read.
+        self.since = (
+            self.store.watermark(type(self).__name__) if config.skip_unchanged else None
+        )
+        self.cataloged_at = time.time()
+        self.files = self.mount_catalog()
+        self.profiles = ProfileExtractor(self.features, self.parse_only)
+        self.snippets = FightSnippetExtractor(self.features, self.parse_only)
+
+    def mount_catalog(self) -> list:
+
+        # With parse_from_bundle, pages are read in place from an exported bundle instead of the store.
+        self.source = (
+            SnapshotBundle(self.config.bundle_file)
+            if self.config.parse_from_bundle
+            else self.store
+        )
+
+        return snapshot_documents(self.source, SNAPSHOT_KIND, self.since)
+
+    def mark_parsed(self) -> None:
+        """Records that every page in this parser's catalog has been parsed and loaded, so a later skip_unchanged run starts after them."""
+
+        self.store.set_watermark(type(self).__name__, self.cataloged_at)
+
+    def __enter__(self) -> "ProfilePagesParser":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the bundle the catalog was read from (if any) and the snapshot store."""
+
+        if self.source is not self.store:
+            self.source.close()
+        self.store.close()
+
+    async def parse(self) -> tuple[list[BoxerProfile], list[list[FightSnippet]]]:
+
+        start = time.perf_counter()
+
+        all_profiles = []
+        all_fightsnips = []
+
+        files = self.files
+
+        for count, (entry, read) in enumerate(files):
+
+            boxrec_id = entry["ident"]
+
+            try:
+                soup = await create_soup(read(), self.features, self.parse_only)
+            except:
+                log_msg(
+                    f"Parsing did NOT complete for profile page: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                )
+                continue
+
+            boxer_name = None
+            br_boxer_id = None
+
+            # Only the first career page carries the profile table.
+            if entry["part"] == 0:
+                try:
+                    profile = await self.profiles.extract_profile_from_soup(soup)
+                    all_profiles.append(profile)
+                    # The snippets reuse the name and ID the profile read off the page; the profile's ""/0 defaults mean it found none.
+                    if profile.boxer_name:
+                        boxer_name = clean_str(profile.boxer_name)
+                    if profile.br_boxer_id:
+                        br_boxer_id = profile.br_boxer_id
+                    log_msg(
+                        f"Profile Parser extracted data from html file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                    )
+                except:
+                    log_msg(
+                        f"Profile Parsing did NOT complete for file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                    )
+
+            try:
+                career = await self.snippets.extract_snippets_from_soup(
+                    soup, boxer_name, br_boxer_id
+                )
+                all_fightsnips.append(career)
+                log_msg(
+                    f"Fight Snips Parser extracted data from html file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                )
+            except:
+                log_msg(
+                    f"Parsing did NOT complete for fightsnip file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                )
+                continue
+
+        elapsed = time.perf_counter() - start
+        log_msg(
+            f"\n[ProfilePagesParser]: Profile Pages Parser extracted profiles and fight snips from available html files: {elapsed} seconds!\n"
+        )
+
+        return all_profiles, all_fightsnips
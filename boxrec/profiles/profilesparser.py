@@ -4,15 +4,18 @@ from pathlib import Path
 from datetime import date, datetime
 import time
 
-from bs4 import BeautifulSoup as bs
+from bs4 import BeautifulSoup as bs, SoupStrainer
 from typing import Any
 
 from config import ScrapeConfig, read_config
 from log import log_msg
+from snapshotstore import SnapshotBundle, snapshot_documents
+from export import SNAPSHOT_KIND, open_snapshot_store
 from profile import BoxerProfile, from_dict_to_dataclass
-from urls import get_br_id_from_file
 from transform import (
+    PROFILE_PAGE_PARTS,
     create_soup,
+    soup_backend,
     clean_str,
     rekey,
     convert_to_float,
@@ -20,25 +23,12 @@ from transform import (
 )
 
 
-class ProfilesParser:
-    def __init__(self, config: ScrapeConfig):
-        self.config = config
-        self.files = self.mount_files()
-        self.archived = self.mount_archived()
-
-    def mount_files(self) -> list[Path]:
-
-        directory = "snapshots"
-        files = list(Path(directory).glob("*"))
-
-        return files
-
-    def mount_archived(self) -> Path:
-
-        directory = self.config.collected_profiles_dir
-        files = list(Path(directory).glob("*"))
+class ProfileExtractor:
+    """Extracts a BoxerProfile from a profile page; it holds no store or catalog, so ProfilePagesParser can share it."""
 
-        return files
+    def __init__(self, features: str, parse_only: SoupStrainer = None) -> None:
+        self.features = features
+        self.parse_only = parse_only
 
     def add_boxer_name(self, h1_tags: bs, profile_dict: dict) -> None:
 
@@ -181,7 +171,11 @@ class ProfilesParser:
 
     async def extract_profile(self, response_text: str) -> BoxerProfile:
 
-        soup = await create_soup(response_text)
+        soup = await create_soup(response_text, self.features, self.parse_only)
+
+        return await self.extract_profile_from_soup(soup)
+
+    async def extract_profile_from_soup(self, soup: bs) -> BoxerProfile:
 
         h1_tags = soup.find_all("h1")
         h2_tags = soup.find_all("h2")
@@ -263,6 +257,51 @@ class ProfilesParser:
 
         return from_dict_to_dataclass(BoxerProfile, profile_dict)
 
+
+class ProfilesParser(ProfileExtractor):
+    def __init__(self, config: ScrapeConfig):
+        super().__init__(
+            soup_backend(config.html_parser),
+            PROFILE_PAGE_PARTS if config.targeted_parsing else None,
+        )
+        self.config = config
+        self.store = open_snapshot_store(config)
+        # With skip_unchanged, only pages whose content changed since the last mark_parsed() are read.
+        self.since = (
+            self.store.watermark(type(self).__name__) if config.skip_unchanged else None
+        )
+        self.cataloged_at = time.time()
+        self.files = self.mount_catalog()
+
+    def mount_catalog(self) -> list:
+
+        # With parse_from_bundle, pages are read in place from an exported bundle instead of the store.
+        self.source = (
+            SnapshotBundle(self.config.bundle_file)
+            if self.config.parse_from_bundle
+            else self.store
+        )
+
+        return snapshot_documents(self.source, SNAPSHOT_KIND, self.since)
+
+    def mark_parsed(self) -> None:
+        """Records that every page in this parser's catalog has been parsed and loaded, so a later skip_unchanged run starts after them."""
+
+        self.store.set_watermark(type(self).__name__, self.cataloged_at)
+
+    def __enter__(self) -> "ProfilesParser":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the bundle the catalog was read from (if any) and the snapshot store."""
+
+        if self.source is not self.store:
+            self.source.close()
+        self.store.close()
+
     async def parse(self) -> list[BoxerProfile]:
 
         start = time.perf_counter()
@@ -271,25 +310,25 @@ class ProfilesParser:
 
         files = self.files
 
-        for count, file in enumerate(files):
-
-            boxrec_id = await get_br_id_from_file(file)
-
-            if "-2" not in boxrec_id and "-1" not in boxrec_id:
-                with open(file, "r", encoding="utf-8") as f:
-                    response_text = f.read()
-
-                    try:
-                        profile = await self.extract_profile(response_text)
-                        all_profiles.append(profile)
-                        log_msg(
-                            f"Profile Parser extracted data from html file: {count+1}/{len(list(files))}... boxer-ID#: {boxrec_id}"
-                        )
-                    except:
-                        log_msg(
-                            f"Profile Parsing did NOT complete for file: {count+1}/{len(list(files))}... boxer-ID#: {boxrec_id}"
-                        )
-                        continue
+        for count, (entry, read) in enumerate(files):
+
+            boxrec_id = entry["ident"]
+
+            # Only the first career page carries the profile table.
+            if entry["part"] == 0:
+                response_text = read()
+
+                try:
+                    profile = await self.extract_profile(response_text)
+                    all_profiles.append(profile)
+                    log_msg(
+                        f"Profile Parser extracted data from html file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                    )
+                except:
+                    log_msg(
+                        f"Profile Parsing did NOT complete for file: {count+1}/{len(files)}... boxer-ID#: {boxrec_id}"
+                    )
+                    continue
 
         elapsed = time.perf_counter() - start
         log_msg(
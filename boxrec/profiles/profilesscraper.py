@@ -1,67 +1,207 @@
 import time
+from functools import partial
 import aiohttp
 import asyncio
 
 from config import ScrapeConfig
 from log import log_msg
+from journal import CrawlJournal
+from snapshotstore import SnapshotStore
+from throttle import RateLimiter, AdaptiveConcurrency
+from retry import RetryPolicy, DeadLetters
 from urls import get_br_id_from_url
-from export import export_scraped_content
-from request import create_agents_list, random_header_agent, fetch_with_sem
+from export import SnapshotWriter, save_snapshot, snapshot_key
+from request import (
+    HeaderFactory,
+    fetch_with_retry,
+    byte_summary,
+    multipage_code,
+)
 
 
 class ProfilesScraper:
     def __init__(self, config: ScrapeConfig) -> None:
         self.config = config
+        self.policy = RetryPolicy(config.max_attempts, config.retry_base_delay)
+        self.dead_letters = DeadLetters("profiles")
+        self.headers = HeaderFactory.from_config(config)
 
-    async def scrape(self, urls: list[str]):
+    def is_unchanged(self, profile: dict) -> bool:
+        """True if the server answered 304 or sent back a body byte-identical to the stored snapshot."""
 
-        start = time.perf_counter()
-        log_msg(
-            f"\n[ProfilesScraper]: Profiles Scraper has begun scraping profile URLs...\n"
-        )
+        return profile.get("not_modified") or profile.get(
+            "content_hash"
+        ) == self.store.current_hash(snapshot_key(profile))
 
-        collected_profiles = []
+    def finish_saved(self, profile: dict) -> None:
+        """Journals a page's URL as done once the writer has saved and synced it, so a crash before then leaves it to be fetched again."""
 
-        lst = await create_agents_list()
+        self.journal.finish(profile["url_string"], profile)
 
-        sem = asyncio.Semaphore(4)
-        conn = aiohttp.TCPConnector(limit=20)
-        async with aiohttp.ClientSession(connector=conn) as session:
-            for count, url in enumerate(urls):
+    def enqueue(self, frontier: asyncio.Queue, seen: set[str], url: str) -> None:
+        """Adds a URL to the crawl frontier unless it has already been queued during this run."""
 
-                headers = await random_header_agent(lst)
+        if url not in seen:
+            seen.add(url)
+            self.journal.add([url])
+            frontier.put_nowait(url)
+
+    async def worker(
+        self,
+        frontier: asyncio.Queue,
+        seen: set[str],
+        session: aiohttp.ClientSession,
+        writer: SnapshotWriter,
+        stop: asyncio.Event,
+        controller: AdaptiveConcurrency,
+        limiter: RateLimiter,
+    ) -> None:
+        """Pulls URLs off the frontier, fetches them, and enqueues any follow-up career pages discovered."""
+
+        while True:
+            url = await frontier.get()
+            try:
+                if stop.is_set():
+                    continue
+
+                headers = self.headers()
                 br_boxer_id = await get_br_id_from_url(url)
+                if self.store.has(
+                    snapshot_key({"boxrec_id": br_boxer_id, "url_string": url})
+                ):
+                    headers.update(self.journal.conditional_headers(url))
 
-                try:
-                    profile = await fetch_with_sem(
-                        sem, url, session, headers, br_boxer_id
+                self.journal.start(url)
+                profile = await fetch_with_retry(
+                    self.policy,
+                    controller,
+                    url,
+                    session,
+                    headers,
+                    br_boxer_id,
+                    limiter,
+                )
+
+                if profile.get("not_modified"):
+                    # A 304 has no body, so the career pages to follow are read off the snapshot it confirmed.
+                    profile["multipage_code"] = multipage_code(
+                        url, self.store.read(snapshot_key(profile)) or ""
                     )
 
-                    if profile.get("multipage_code") == 2:
-                        urls.append(url + "?&offset=100")
-                        urls.append(url + "?&offset=200")
-                    if profile.get("multipage_code") == 1:
-                        urls.append(url + "?&offset=100")
+                if profile.get("multipage_code") == 2:
+                    self.enqueue(frontier, seen, url + "?&offset=100")
+                    self.enqueue(frontier, seen, url + "?&offset=200")
+                if profile.get("multipage_code") == 1:
+                    self.enqueue(frontier, seen, url + "?&offset=100")
 
-                    if profile.get("content_flag") == True:
-                        collected_profiles.append(profile)
-                        log_msg(
-                            f"Successfully scraped br_boxer_id#: {br_boxer_id}... count: {count+1}/{len(urls)}"
-                        )
+                if profile.get("content_flag") == True:
+                    self.scraped += 1
+                    self.wire_bytes += profile.get("wire_bytes", 0)
+                    self.decoded_bytes += profile.get("decoded_bytes", 0)
+                    if self.is_unchanged(profile):
+                        self.unchanged += 1
+                        self.not_modified += bool(profile.get("not_modified"))
+                        self.journal.finish(url, profile)
+                        # Never handed to the writer, so its body is released here.
+                        profile["response_text"] = None
                     else:
-                        log_msg(
-                            f"\nFailed to scraped br_boxer_id#: {br_boxer_id}... count: {count+1}/{len(urls)}"
-                        )
-                        break
-                except:
+                        self.changed += 1
+                        # Its URL stays in-flight until the writer has it on disk (see finish_saved).
+                        await writer.put(profile)
+                    log_msg(
+                        f"Successfully scraped br_boxer_id#: {br_boxer_id}... count: {self.scraped}/{len(seen)} ({profile.get('wire_bytes', 0)} bytes on the wire, {profile.get('decoded_bytes', 0)} decoded)"
+                    )
+                else:
+                    self.journal.finish(url, profile)
+                    profile["response_text"] = None
+                    self.dead_letters.add(url, profile)
                     log_msg(
-                        f"\nbr_boxer_id: {br_boxer_id}, {count+1}/{len(urls)} failed to create profile >>> broken in the scrape() except: block."
+                        f"\nFailed to scraped br_boxer_id#: {br_boxer_id}... count: {self.scraped+1}/{len(seen)} after {profile.get('attempts')} attempts // concurrency now: {controller.limit}"
+                    )
+                    if controller.exhausted():
+                        stop.set()
+            finally:
+                frontier.task_done()
+
+    async def scrape(self, urls: list[str]):
+        """Crawls the given profile URLs with a pool of workers sharing one frontier (the controller decides how many fetch at once), saving each page as it arrives."""
+
+        start = time.perf_counter()
+        log_msg(
+            f"\n[ProfilesScraper]: Profiles Scraper has begun scraping profile URLs...\n"
+        )
+
+        self.scraped = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.not_modified = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+
+        self.journal = CrawlJournal(self.config.journal_file)
+        self.store = SnapshotStore(self.config.snapshot_store_dir)
+
+        frontier = asyncio.Queue()
+        seen = set()
+        stop = asyncio.Event()
+        limiter = RateLimiter(self.config.rate_limit, self.config.rate_burst)
+        controller = AdaptiveConcurrency(
+            self.config.concurrency, self.config.max_concurrency
+        )
+        for url in urls:
+            self.enqueue(frontier, seen, url)
+
+        conn = aiohttp.TCPConnector(limit=self.config.max_concurrency)
+        async with SnapshotWriter(
+            partial(save_snapshot, self.store),
+            self.store.sync,
+            on_saved=self.finish_saved,
+        ) as writer:
+            async with aiohttp.ClientSession(
+                connector=conn, auto_decompress=False
+            ) as session:
+                workers = [
+                    asyncio.create_task(
+                        self.worker(
+                            frontier,
+                            seen,
+                            session,
+                            writer,
+                            stop,
+                            controller,
+                            limiter,
+                        )
+                    )
+                    for _ in range(self.config.max_concurrency)
+                ]
+                # A worker only returns by raising (e.g. the writer's error), which ends the crawl.
+                crawl = asyncio.create_task(frontier.join())
+                try:
+                    done, _ = await asyncio.wait(
+                        (crawl, *workers), return_when=asyncio.FIRST_COMPLETED
                     )
-                    break
+                    for task in done:
+                        task.result()
+                finally:
+                    crawl.cancel()
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(crawl, *workers, return_exceptions=True)
 
         elapsed = time.perf_counter() - start
         log_msg(
-            f"\n[ProfilesScraper]: Finished scraping {len(collected_profiles)} profile pages: {elapsed} seconds!\n"
+            f"\n[ProfilesScraper]: Finished scraping {self.scraped} profile pages: {elapsed} seconds! ({controller.summary()})\n"
+        )
+
+        log_msg(
+            f"[ProfilesScraper]: {self.changed} pages changed, {self.unchanged} unchanged ({self.not_modified} not modified, {self.unchanged - self.not_modified} byte-identical to their snapshot)"
+        )
+
+        log_msg(
+            f"[ProfilesScraper]: Transferred {byte_summary(self.wire_bytes, self.decoded_bytes)}"
         )
 
-        await export_scraped_content(collected_profiles)
+        self.dead_letters.save()
+        log_msg(f"[ProfilesScraper]: Crawl journal: {self.journal.counts()}")
+        self.journal.close()
+        self.store.close()
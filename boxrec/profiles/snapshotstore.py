@@ -0,0 +1,876 @@
+import hashlib
+import io
+import json
+import mmap
+import os
+import sqlite3
+import tarfile
+import threading
+import time
+import zlib
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD = "zstd"
+ZLIB = "zlib"
+DEFAULT_CODEC = ZSTD if zstandard is not None else ZLIB
+SEGMENT_SIZE = 64 * 1024 * 1024
+CODEC_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard else ())
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_BLOBS = "blobs.dat"
+CATALOG_QUERY = """
+    SELECT c.*, s.url, s.segment, s.offset, s.length, s.codec, s.fetched_at
+    FROM catalog c LEFT JOIN snapshots s ON s.id = c.snapshot_id
+"""
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Compresses a snapshot body with the given codec."""
+
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+
+    return zlib.compress(data, 6)
+
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    """Decompresses a snapshot blob written with the given codec."""
+
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError(
+                "The zstandard package is needed to read zstd snapshots."
+            )
+        return zstandard.ZstdDecompressor().decompress(blob)
+
+    return zlib.decompress(blob)
+
+
+class SnapshotStore:
+    """Compressed, content-hashed page snapshots packed into append-only segment files, with a SQLite index from snapshot key to blob location."""
+
+    def __init__(
+        self, root: str, segment_size: int = SEGMENT_SIZE, codec: str = DEFAULT_CODEC
+    ) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.codec = codec
+        # Pages are saved from a worker thread while the event loop reads the index.
+        self.lock = threading.Lock()
+        self.cnxn = sqlite3.connect(
+            self.root / "index.sqlite3", isolation_level=None, check_same_thread=False
+        )
+        self.cnxn.row_factory = sqlite3.Row
+        self.cnxn.execute("PRAGMA journal_mode=WAL")
+        self.cnxn.execute("PRAGMA synchronous=NORMAL")
+        self.cnxn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                key             TEXT    NOT NULL,
+                url             TEXT,
+                hash            TEXT    NOT NULL,
+                segment         INTEGER NOT NULL,
+                offset          INTEGER NOT NULL,
+                length          INTEGER NOT NULL,
+                size            INTEGER NOT NULL,
+                codec           TEXT    NOT NULL,
+                fetched_at      REAL    NOT NULL
+            )
+            """)
+        self.cnxn.execute(
+            "CREATE INDEX IF NOT EXISTS snapshots_key ON snapshots (key, id)"
+        )
+        self.cnxn.execute(
+            "CREATE INDEX IF NOT EXISTS snapshots_hash ON snapshots (hash)"
+        )
+        # One row per page known to the scraper, whether held in a segment (snapshot_id) or as a loose legacy file (path).
+        self.cnxn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog (
+                key             TEXT    PRIMARY KEY,
+                kind            TEXT,
+                ident           TEXT,
+                part            INTEGER NOT NULL DEFAULT 0,
+                shard           TEXT,
+                path            TEXT,
+                size            INTEGER,
+                mtime           REAL,
+                hash            TEXT,
+                snapshot_id     INTEGER
+            )
+            """)
+        # Stores created before pages were sharded gain the column in place.
+        columns = [
+            row["name"] for row in self.cnxn.execute("PRAGMA table_info(catalog)")
+        ]
+        if "shard" not in columns:
+            self.cnxn.execute("ALTER TABLE catalog ADD COLUMN shard TEXT")
+        self.cnxn.execute(
+            "CREATE INDEX IF NOT EXISTS catalog_kind ON catalog (kind, ident)"
+        )
+        self.cnxn.execute(
+            "CREATE INDEX IF NOT EXISTS catalog_shard ON catalog (kind, shard)"
+        )
+        self.cnxn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.segment = (
+            self.cnxn.execute("SELECT MAX(segment) FROM snapshots").fetchone()[0] or 1
+        )
+        self.segment_file = None
+        self.maps = {}
+
+    def __enter__(self) -> "SnapshotStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.segment_file is not None:
+            self.segment_file.close()
+        for mapped in self.maps.values():
+            mapped.close()
+        self.cnxn.close()
+
+    def segment_path(self, segment: int) -> Path:
+        """Returns the file holding the given segment."""
+
+        return self.root / f"segment-{segment:06d}.dat"
+
+    def append(self, blob: bytes) -> tuple[int, int]:
+        """Appends a blob to the open segment, rolling over to a new segment once it is full, and returns (segment, offset)."""
+
+        if self.segment_file is None:
+            self.segment_file = open(self.segment_path(self.segment), "ab")
+
+        offset = self.segment_file.tell()
+        if offset and offset + len(blob) > self.segment_size:
+            os.fsync(self.segment_file.fileno())
+            self.segment_file.close()
+            self.segment += 1
+            self.segment_file = open(self.segment_path(self.segment), "ab")
+            offset = self.segment_file.tell()
+
+        self.segment_file.write(blob)
+        self.segment_file.flush()
+
+        return self.segment, offset
+
+    def sync(self) -> None:
+        """Forces the blobs appended so far onto disk; writers call this once per batch of pages rather than per page."""
+
+        with self.lock:
+            if self.segment_file is not None:
+                os.fsync(self.segment_file.fileno())
+
+    def put(
+        self,
+        key: str,
+        response_text: str,
+        url: str = None,
+        kind: str = None,
+        ident: str = None,
+        part: int = 0,
+        shard: str = None,
+        fetched_at: float = None,
+    ) -> str:
+        """Stores a page body as the newest version of the given key, catalogs it, and returns its content hash."""
+
+        return self.put_bytes(
+            key,
+            response_text.encode("utf-8"),
+            url,
+            kind,
+            ident,
+            part,
+            shard,
+            fetched_at,
+        )
+
+    def put_bytes(
+        self,
+        key: str,
+        data: bytes,
+        url: str = None,
+        kind: str = None,
+        ident: str = None,
+        part: int = 0,
+        shard: str = None,
+        fetched_at: float = None,
+        blob: bytes = None,
+        codec: str = None,
+        changed_at: float = None,
+    ) -> str:
+        """Stores an encoded page body as the newest version of the given key, catalogs it, and returns its content hash. A body identical to the key's current one is not stored again, a body already held under another key shares that blob, and a blob already compressed with codec is stored as is."""
+
+        digest = hashlib.sha256(data).hexdigest()
+        fetched_at = fetched_at or time.time()
+        # The catalog row's mtime is when this store's copy changed (what skip_unchanged parsers compare their watermarks with), which is not always when the page was fetched.
+        changed_at = changed_at or time.time()
+
+        with self.lock:
+            if self.current_hash(key) == digest:
+                return digest
+
+            shared = self.cnxn.execute(
+                "SELECT segment, offset, length, codec FROM snapshots WHERE hash = ? LIMIT 1",
+                (digest,),
+            ).fetchone()
+            if shared is not None:
+                segment, offset, length, codec = shared
+            else:
+                if blob is None:
+                    blob, codec = compress(data, self.codec), self.codec
+                segment, offset = self.append(blob)
+                length = len(blob)
+
+            with self.cnxn:
+                self.cnxn.execute("BEGIN")
+                snapshot_id = self.cnxn.execute(
+                    """
+                    INSERT INTO snapshots (key, url, hash, segment, offset, length, size, codec, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        key,
+                        url,
+                        digest,
+                        segment,
+                        offset,
+                        length,
+                        len(data),
+                        codec,
+                        fetched_at,
+                    ),
+                ).lastrowid
+                self.cnxn.execute(
+                    """
+                    INSERT INTO catalog (key, kind, ident, part, shard, path, size, mtime, hash, snapshot_id)
+                    VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET
+                        kind = excluded.kind,
+                        ident = excluded.ident,
+                        part = excluded.part,
+                        shard = excluded.shard,
+                        path = NULL,
+                        size = excluded.size,
+                        mtime = excluded.mtime,
+                        hash = excluded.hash,
+                        snapshot_id = excluded.snapshot_id
+                    """,
+                    (
+                        key,
+                        kind,
+                        ident,
+                        part,
+                        shard,
+                        len(data),
+                        changed_at,
+                        digest,
+                        snapshot_id,
+                    ),
+                )
+
+        return digest
+
+    def register_files(
+        self,
+        files: Iterable[Path],
+        describe: Callable[[str], tuple[str, str, int, str]],
+    ) -> int:
+        """Catalogs loose html files (keyed by file stem, described as (kind, ident, part, shard); names describe() returns None for are skipped) that the store does not already hold, and returns how many were added or moved."""
+
+        rows = []
+        for file in files:
+            key = Path(file).stem
+            description = describe(key)
+            if description is None:
+                continue
+            stat = Path(file).stat()
+            rows.append((key, *description, str(file), stat.st_size, stat.st_mtime))
+
+        with self.lock, self.cnxn:
+            self.cnxn.execute("BEGIN")
+            before = self.cnxn.total_changes
+            self.cnxn.executemany(
+                """
+                INSERT INTO catalog (key, kind, ident, part, shard, path, size, mtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    shard = excluded.shard,
+                    path = excluded.path,
+                    size = excluded.size,
+                    mtime = excluded.mtime
+                WHERE catalog.snapshot_id IS NULL
+                """,
+                rows,
+            )
+
+            return self.cnxn.total_changes - before
+
+    def is_scanned(self, directory: str) -> bool:
+        """True once a legacy html directory has been registered with the catalog."""
+
+        return (
+            self.cnxn.execute(
+                "SELECT 1 FROM meta WHERE key = ?", (f"scanned:{directory}",)
+            ).fetchone()
+            is not None
+        )
+
+    def set_scanned(self, directory: str) -> None:
+        """Records that a legacy html directory has been registered with the catalog."""
+
+        self.cnxn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (f"scanned:{directory}", str(time.time())),
+        )
+
+    def watermark(self, name: str) -> float:
+        """Returns the catalog time a consumer (e.g. a parser) last processed pages up to, or None if it never has."""
+
+        row = self.cnxn.execute(
+            "SELECT value FROM meta WHERE key = ?", (f"watermark:{name}",)
+        ).fetchone()
+
+        return float(row[0]) if row is not None else None
+
+    def set_watermark(self, name: str, value: float) -> None:
+        """Records that a consumer has processed every page cataloged up to the given time."""
+
+        self.cnxn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (f"watermark:{name}", str(value)),
+        )
+
+    def current_hash(self, key: str) -> str:
+        """Returns the content hash of a key's current body, or None if it is not stored (loose legacy files have no hash)."""
+
+        row = self.cnxn.execute(
+            "SELECT hash FROM catalog WHERE key = ?", (key,)
+        ).fetchone()
+
+        return row[0] if row is not None else None
+
+    def latest(self, key: str) -> sqlite3.Row:
+        """Returns the index entry for the newest version of a key, or None if it was never stored."""
+
+        return self.cnxn.execute(
+            "SELECT * FROM snapshots WHERE key = ? ORDER BY id DESC LIMIT 1", (key,)
+        ).fetchone()
+
+    def has(self, key: str) -> bool:
+        """True if the key is cataloged, either in the store or as a loose file."""
+
+        return (
+            self.cnxn.execute("SELECT 1 FROM catalog WHERE key = ?", (key,)).fetchone()
+            is not None
+        )
+
+    def mapped(self, segment: int, end: int) -> mmap.mmap:
+        """Returns a read-only memory map of a segment, remapping it when the segment has grown past the end of the last mapping."""
+
+        mapped = self.maps.get(segment)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self.segment_path(segment), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[segment] = mapped
+
+        return mapped
+
+    def read_blob(self, entry: sqlite3.Row) -> bytes:
+        """Decompresses the page body an index entry points at straight out of its memory-mapped segment, without copying the compressed blob."""
+
+        start, end = entry["offset"], entry["offset"] + entry["length"]
+        with memoryview(self.mapped(entry["segment"], end)) as view:
+            with view[start:end] as blob:
+                return decompress(blob, entry["codec"])
+
+    def read_entry(self, entry: sqlite3.Row) -> str:
+        """Reads and decompresses the page body an index entry points at."""
+
+        return self.read_blob(entry).decode("utf-8")
+
+    def read_cataloged(
+        self, entry: sqlite3.Row, encoding: str = None, errors: str = None
+    ) -> str:
+        """Reads the body behind a catalog entry, from its segment or (with the given encoding) its loose file."""
+
+        if entry["path"] is not None:
+            return Path(entry["path"]).read_text(encoding, errors)
+
+        return self.read_entry(entry)
+
+    def read_cataloged_bytes(self, entry: sqlite3.Row) -> bytes:
+        """Reads the undecoded body behind a catalog entry, from its memory-mapped segment or its loose file."""
+
+        if entry["path"] is not None:
+            return Path(entry["path"]).read_bytes()
+
+        return self.read_blob(entry)
+
+    def read(self, key: str) -> str:
+        """Returns the newest body for a key, or None if it is not cataloged."""
+
+        entry = self.cnxn.execute(f"{CATALOG_QUERY} WHERE c.key = ?", (key,)).fetchone()
+
+        return self.read_cataloged(entry) if entry is not None else None
+
+    def catalog(
+        self, kind: str = None, since: float = None, shard: str = None
+    ) -> list[sqlite3.Row]:
+        """Returns every catalog entry (optionally of one kind, of one shard, and only those whose content changed after since), stored pages first in segment order so reads sweep each file forwards."""
+
+        # A catalog row's mtime only moves when its body changes, so it doubles as the change time.
+        return self.cnxn.execute(
+            f"""
+            {CATALOG_QUERY}
+            WHERE (? IS NULL OR c.kind = ?)
+                AND (? IS NULL OR c.mtime > ?)
+                AND (? IS NULL OR c.shard = ?)
+            ORDER BY c.path IS NOT NULL, s.segment, s.offset, c.path
+            """,
+            (kind, kind, since, since, shard, shard),
+        ).fetchall()
+
+    def shards(self, kind: str = None) -> list[str]:
+        """Returns every shard holding cataloged pages, optionally of one kind, in order."""
+
+        return [
+            row[0]
+            for row in self.cnxn.execute(
+                "SELECT DISTINCT shard FROM catalog WHERE (? IS NULL OR kind = ?) AND shard IS NOT NULL ORDER BY shard",
+                (kind, kind),
+            )
+        ]
+
+    def set_shards(self, kind: str, shard_of: Callable[[str], str]) -> int:
+        """Fills in the shard (from its ident) of every cataloged page of a kind that predates sharding, and returns how many were updated."""
+
+        rows = [
+            (shard_of(ident), key)
+            for key, ident in self.cnxn.execute(
+                "SELECT key, ident FROM catalog WHERE kind = ? AND shard IS NULL",
+                (kind,),
+            ).fetchall()
+        ]
+        with self.lock, self.cnxn:
+            self.cnxn.execute("BEGIN")
+            self.cnxn.executemany("UPDATE catalog SET shard = ? WHERE key = ?", rows)
+
+        return len(rows)
+
+    def idents(self, kind: str = None, part: int = None) -> list[str]:
+        """Returns the ident of every cataloged page, optionally narrowed to one kind and part."""
+
+        query = "SELECT ident FROM catalog WHERE (? IS NULL OR kind = ?) AND (? IS NULL OR part = ?)"
+
+        return [row[0] for row in self.cnxn.execute(query, (kind, kind, part, part))]
+
+    def pages(self, kind: str = None) -> list[tuple[str, int]]:
+        """Returns (ident, part) for every cataloged page, optionally of one kind."""
+
+        return [
+            (row[0], row[1])
+            for row in self.cnxn.execute(
+                "SELECT ident, part FROM catalog WHERE (? IS NULL OR kind = ?)",
+                (kind, kind),
+            )
+        ]
+
+    def keys(self) -> list[str]:
+        """Returns every cataloged key."""
+
+        return [row[0] for row in self.cnxn.execute("SELECT key FROM catalog")]
+
+    def urls(self) -> list[str]:
+        """Returns the URL of every stored page that recorded one."""
+
+        return [
+            row[0]
+            for row in self.cnxn.execute(
+                "SELECT DISTINCT url FROM snapshots WHERE url IS NOT NULL"
+            )
+        ]
+
+    def segments(self) -> list[int]:
+        """Returns the number of every segment file on disk."""
+
+        return sorted(
+            int(path.stem.split("-")[1]) for path in self.root.glob("segment-*.dat")
+        )
+
+    def disk_usage(self) -> int:
+        """Returns the bytes held on disk by the segment files and the loose files still in the catalog."""
+
+        loose = [
+            Path(row[0])
+            for row in self.cnxn.execute(
+                "SELECT path FROM catalog WHERE path IS NOT NULL"
+            )
+        ]
+
+        return sum(self.segment_path(n).stat().st_size for n in self.segments()) + sum(
+            path.stat().st_size for path in loose if path.exists()
+        )
+
+    def pack_loose(self) -> int:
+        """Moves every cataloged loose legacy file into the segments, deleting each file once its packed copy reads back with the same checksum, and returns how many were packed."""
+
+        packed = 0
+        for row in self.cnxn.execute(
+            "SELECT * FROM catalog WHERE path IS NOT NULL AND snapshot_id IS NULL"
+        ).fetchall():
+            path = Path(row["path"])
+            if not path.exists():
+                continue
+
+            digest = self.put_bytes(
+                row["key"],
+                path.read_bytes(),
+                None,
+                row["kind"],
+                row["ident"],
+                row["part"],
+                row["shard"],
+                row["mtime"],
+                # Packing does not change the page, so parsers should not see it as new.
+                changed_at=row["mtime"],
+            )
+            if (
+                hashlib.sha256(self.read_blob(self.latest(row["key"]))).hexdigest()
+                == digest
+            ):
+                path.unlink()
+                packed += 1
+
+        return packed
+
+    def drop_versions(self, keep: int) -> int:
+        """Removes all but the newest keep versions of every key from the index, and returns how many were removed."""
+
+        if keep < 1:
+            raise ValueError("At least the current version of each page must be kept.")
+
+        with self.lock, self.cnxn:
+            self.cnxn.execute("BEGIN")
+            before = self.cnxn.total_changes
+            self.cnxn.execute(
+                """
+                DELETE FROM snapshots WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY key ORDER BY id DESC) AS version
+                        FROM snapshots
+                    )
+                    WHERE version > ?
+                )
+                """,
+                (keep,),
+            )
+
+            return self.cnxn.total_changes - before
+
+    def rewrite_segments(self) -> int:
+        """Copies every blob still referenced by the index into fresh, densely packed segments (verifying each against its content hash on the way), deletes the old segment files, and returns how many corrupt blobs were dropped."""
+
+        with self.lock:
+            old = self.segments()
+            if self.segment_file is not None:
+                self.segment_file.close()
+                self.segment_file = None
+            first = self.segment = max(old, default=0) + 1
+
+            moved, corrupt = [], []
+            blobs = self.cnxn.execute("""
+                SELECT segment, offset, length, codec, hash FROM snapshots
+                GROUP BY segment, offset, length ORDER BY segment, offset
+                """).fetchall()
+            for entry in blobs:
+                start, end = entry["offset"], entry["offset"] + entry["length"]
+                try:
+                    blob = self.mapped(entry["segment"], end)[start:end]
+                    intact = (
+                        len(blob) == entry["length"]
+                        and hashlib.sha256(decompress(blob, entry["codec"])).hexdigest()
+                        == entry["hash"]
+                    )
+                except (OSError, ValueError, *CODEC_ERRORS):
+                    intact = False
+                if not intact:
+                    corrupt.append((entry["segment"], entry["offset"]))
+                    continue
+
+                segment, offset = self.append(blob)
+                moved.append((segment, offset, entry["segment"], entry["offset"]))
+
+            if self.segment_file is not None:
+                self.segment_file.close()
+                self.segment_file = None
+            for segment in range(first, self.segment + 1):
+                if self.segment_path(segment).exists():
+                    with open(self.segment_path(segment), "rb") as f:
+                        os.fsync(f.fileno())
+
+            with self.cnxn:
+                self.cnxn.execute("BEGIN")
+                self.cnxn.executemany(
+                    "DELETE FROM snapshots WHERE segment = ? AND offset = ?", corrupt
+                )
+                self.cnxn.executemany(
+                    "UPDATE snapshots SET segment = ?, offset = ? WHERE segment = ? AND offset = ?",
+                    moved,
+                )
+                # Pages whose current version was corrupt fall back to their newest intact version, or leave the catalog so they are scraped again.
+                for (key,) in self.cnxn.execute("""
+                    SELECT key FROM catalog
+                    WHERE snapshot_id IS NOT NULL AND snapshot_id NOT IN (SELECT id FROM snapshots)
+                    """).fetchall():
+                    newest = self.latest(key)
+                    if newest is None:
+                        self.cnxn.execute("DELETE FROM catalog WHERE key = ?", (key,))
+                    else:
+                        self.cnxn.execute(
+                            "UPDATE catalog SET snapshot_id = ?, hash = ?, size = ?, mtime = ? WHERE key = ?",
+                            (
+                                newest["id"],
+                                newest["hash"],
+                                newest["size"],
+                                # The body changed back, so skip_unchanged parsers must read it again.
+                                time.time(),
+                                key,
+                            ),
+                        )
+
+            for mapped in self.maps.values():
+                mapped.close()
+            self.maps = {}
+            for segment in old:
+                self.segment_path(segment).unlink()
+
+            return len(corrupt)
+
+    def compact(self, keep: int) -> dict:
+        """Packs loose legacy files into the segments, keeps only the newest keep versions of each page, rewrites the segments without dead or corrupt blobs, and reports the space reclaimed."""
+
+        before = self.disk_usage()
+        report = {
+            "packed": self.pack_loose(),
+            "dropped_versions": self.drop_versions(keep),
+            "corrupt": self.rewrite_segments(),
+        }
+        after = self.disk_usage()
+
+        return {
+            **report,
+            "bytes_before": before,
+            "bytes_after": after,
+            "reclaimed_bytes": before - after,
+        }
+
+    def stats(self) -> dict:
+        """Returns key, version and distinct blob counts with stored (compressed, counting shared blobs once) and decoded byte totals."""
+
+        row = self.cnxn.execute("""
+            SELECT COUNT(DISTINCT key), COUNT(*), COALESCE(SUM(size), 0)
+            FROM snapshots
+            """).fetchone()
+        blobs = self.cnxn.execute("""
+            SELECT COUNT(*), COALESCE(SUM(length), 0)
+            FROM (SELECT DISTINCT segment, offset, length FROM snapshots)
+            """).fetchone()
+
+        return {
+            "keys": row[0],
+            "versions": row[1],
+            "blobs": blobs[0],
+            "stored_bytes": blobs[1],
+            "decoded_bytes": row[2],
+        }
+
+
+def sync_catalog(
+    store: SnapshotStore,
+    directory: str,
+    describe: Callable[[str], tuple[str, str, int, str]],
+    refresh: bool = False,
+) -> None:
+    """Registers a legacy html directory (and any shard folders inside it) with the catalog the first time it is seen (or when refresh=True), so later runs skip the directory walk."""
+
+    if refresh or not store.is_scanned(directory):
+        store.register_files(
+            (path for path in Path(directory).rglob("*") if path.is_file()), describe
+        )
+        store.set_scanned(directory)
+
+
+class BlobStream:
+    """File-like reader over the compressed blobs of catalog entries, in order, so they can be streamed into a tar member without loading them all."""
+
+    def __init__(self, store: SnapshotStore, entries: list[sqlite3.Row]) -> None:
+        self.store = store
+        self.entries = iter(entries)
+        self.buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self.buffer) < size:
+            entry = next(self.entries, None)
+            if entry is None:
+                break
+            start, end = entry["offset"], entry["offset"] + entry["length"]
+            self.buffer += self.store.mapped(entry["segment"], end)[start:end]
+
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+
+        return chunk
+
+
+def export_bundle(store: SnapshotStore, path: str, kind: str = None) -> tuple[int, int]:
+    """Writes every stored page (optionally of one kind) to a single plain tar file holding a manifest followed by the pages' compressed blobs back to back, and returns (pages exported, loose files left out)."""
+
+    entries = store.catalog(kind)
+    stored = [entry for entry in entries if entry["snapshot_id"] is not None]
+
+    pages, offset = [], 0
+    for entry in stored:
+        pages.append(
+            {
+                "key": entry["key"],
+                "kind": entry["kind"],
+                "ident": entry["ident"],
+                "part": entry["part"],
+                "shard": entry["shard"],
+                "url": entry["url"],
+                "hash": entry["hash"],
+                "size": entry["size"],
+                "mtime": entry["mtime"],
+                "fetched_at": entry["fetched_at"],
+                "codec": entry["codec"],
+                "offset": offset,
+                "length": entry["length"],
+            }
+        )
+        offset += entry["length"]
+
+    manifest = json.dumps(
+        {"created_at": time.time(), "kind": kind, "pages": pages}
+    ).encode("utf-8")
+
+    # The blobs are already compressed, and an uncompressed tar can be read in place.
+    with tarfile.open(path, "w") as tar:
+        info = tarfile.TarInfo(BUNDLE_MANIFEST)
+        info.size, info.mtime = len(manifest), time.time()
+        tar.addfile(info, io.BytesIO(manifest))
+
+        info = tarfile.TarInfo(BUNDLE_BLOBS)
+        info.size, info.mtime = offset, time.time()
+        tar.addfile(info, BlobStream(store, stored))
+
+    return len(stored), len(entries) - len(stored)
+
+
+class SnapshotBundle:
+    """Read-only view of an exported bundle that reads pages straight out of the tar file, through the same catalog() / read_cataloged_bytes() calls as SnapshotStore."""
+
+    def __init__(self, path: str) -> None:
+        with tarfile.open(path, "r:") as tar:
+            info = tar.next()
+            if info is None or info.name != BUNDLE_MANIFEST:
+                raise ValueError(f"{path} is not a snapshot bundle.")
+            manifest = json.load(tar.extractfile(info))
+            self.base = tar.next().offset_data
+
+        self.pages = manifest["pages"]
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self) -> "SnapshotBundle":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.map.close()
+        self.file.close()
+
+    def catalog(
+        self, kind: str = None, since: float = None, shard: str = None
+    ) -> list[dict]:
+        """Returns the manifest entry of every page in the bundle, optionally narrowed like SnapshotStore.catalog()."""
+
+        return [
+            page
+            for page in self.pages
+            if (kind is None or page["kind"] == kind)
+            and (since is None or page["mtime"] > since)
+            and (shard is None or page["shard"] == shard)
+        ]
+
+    def read_blob(self, page: dict) -> bytes:
+        """Returns the compressed blob of a page, as stored in the bundle."""
+
+        start = self.base + page["offset"]
+
+        return self.map[start : start + page["length"]]
+
+    def read_cataloged_bytes(self, page: dict) -> bytes:
+        """Reads and decompresses the body of a page in the bundle."""
+
+        return decompress(self.read_blob(page), page["codec"])
+
+
+def import_bundle(store: SnapshotStore, path: str) -> tuple[int, int]:
+    """Copies every page of a bundle into the store without recompressing it, checking each body against its hash; returns (pages imported or already current, corrupt pages skipped). Imported pages keep their fetch time but are cataloged as changed now, so skip_unchanged parsers on this host read them."""
+
+    imported = corrupt = 0
+    with SnapshotBundle(path) as bundle:
+        for page in bundle.pages:
+            blob = bundle.read_blob(page)
+            try:
+                data = decompress(blob, page["codec"])
+            except CODEC_ERRORS:
+                data = None
+            if data is None or hashlib.sha256(data).hexdigest() != page["hash"]:
+                corrupt += 1
+                continue
+
+            store.put_bytes(
+                page["key"],
+                data,
+                page["url"],
+                page["kind"],
+                page["ident"],
+                page["part"],
+                page["shard"],
+                # Bundles written before fetch times were exported only carry the catalog time.
+                page.get("fetched_at") or page["mtime"],
+                blob=blob,
+                codec=page["codec"],
+            )
+            imported += 1
+
+    store.sync()
+
+    return imported, corrupt
+
+
+def snapshot_documents(
+    store: SnapshotStore, kind: str = None, since: float = None, shard: str = None
+) -> list[tuple[sqlite3.Row, Callable[[], bytes]]]:
+    """Lists (catalog entry, read) for every cataloged page of a kind (only those of one shard, or changed after since, if given) in a SnapshotStore or SnapshotBundle; read() loads the undecoded body on demand, leaving decoding to the html parser."""
+
+    return [
+        (entry, partial(store.read_cataloged_bytes, entry))
+        for entry in store.catalog(kind, since, shard)
+    ]
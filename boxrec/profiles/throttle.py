@@ -0,0 +1,135 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """Token bucket that paces requests to a steady rate while allowing short bursts."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self) -> None:
+        """Adds the tokens earned since the last refill, capped at the burst size."""
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        """Waits until a token is available and consumes it; waiters are served in arrival order."""
+
+        async with self.lock:
+            self.refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+
+class RateLimiter:
+    """Keeps one TokenBucket per host so every request to the same site shares one budget."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    async def acquire(self, url: str) -> None:
+        """Waits for permission to send a request to the given URL's host. A rate of 0 disables pacing."""
+
+        if self.rate <= 0:
+            return
+
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+
+        await self.buckets[host].acquire()
+
+
+class AdaptiveConcurrency:
+    """AIMD controller used in place of a fixed semaphore: adds one slot per window of healthy responses, halves on throttling, errors, slow or empty pages."""
+
+    def __init__(
+        self,
+        initial: int,
+        maximum: int,
+        minimum: int = 1,
+        slow_after: float = 5.0,
+        cooldown: float = 1.0,
+        patience: int = 5,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.slow_after = slow_after
+        self.cooldown = cooldown
+        self.patience = patience
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.last_decrease = 0.0
+        self.levels = [(0.0, self.limit)]
+        self.started = time.monotonic()
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self) -> "AdaptiveConcurrency":
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def set_limit(self, limit: int) -> None:
+        """Records a new concurrency level along with the time it was chosen."""
+
+        if limit != self.limit:
+            self.limit = limit
+            self.levels.append((time.monotonic() - self.started, limit))
+
+    async def record(self, status_code, elapsed: float, content_flag: bool) -> None:
+        """Adjusts the limit from the outcome of one request."""
+
+        healthy = (
+            status_code is not None
+            and status_code not in (429, 503)
+            and status_code < 500
+            and bool(content_flag)
+            and elapsed <= self.slow_after
+        )
+
+        async with self.condition:
+            now = time.monotonic()
+            if healthy:
+                self.failures = 0
+                self.successes += 1
+                if self.successes >= self.limit:
+                    self.successes = 0
+                    self.set_limit(min(self.limit + 1, self.maximum))
+            else:
+                self.failures += 1
+                self.successes = 0
+                if now - self.last_decrease >= self.cooldown:
+                    self.last_decrease = now
+                    self.set_limit(max(self.limit // 2, self.minimum))
+            self.condition.notify_all()
+
+    def exhausted(self) -> bool:
+        """True once the limit has bottomed out and requests are still failing, so the crawl should stop."""
+
+        return self.limit == self.minimum and self.failures >= self.patience
+
+    def summary(self) -> str:
+        """Describes the levels chosen over the run for logging."""
+
+        peak = max(level for _, level in self.levels)
+        return f"final concurrency: {self.limit}, peak: {peak}, adjustments: {len(self.levels) - 1}"
@@ -3,16 +3,33 @@ import time
 
 import pandas as pd
 import warnings
-from bs4 import BeautifulSoup as bs
+from bs4 import BeautifulSoup as bs, SoupStrainer
+from bs4.builder import builder_registry
 
 from profile import BoxerProfile
 from fightsnippet import FightSnippet
 from log import log_msg
 
+# The only parts of a profile page the profile and fight snippet extractors read; whole tables are kept because both step from a labelled cell to its siblings.
+PROFILE_PAGE_PARTS = SoupStrainer(["h1", "h2", "table"])
 
-async def create_soup(response_text: str) -> bs:
 
-    return bs(response_text, "html.parser")
+def soup_backend(name: str) -> str:
+    """Returns the BeautifulSoup tree builder to parse with: the configured one (e.g. the C-accelerated "lxml") when it is installed, else the pure-Python "html.parser"."""
+
+    return name if builder_registry.lookup(name) is not None else "html.parser"
+
+
+async def create_soup(
+    response_text: str | bytes,
+    features: str = "html.parser",
+    parse_only: SoupStrainer = None,
+) -> bs:
+
+    if isinstance(response_text, bytes):
+        return bs(response_text, features, parse_only=parse_only, from_encoding="utf-8")
+
+    return bs(response_text, features, parse_only=parse_only)
 
 
 def clean_str(text: str) -> str:
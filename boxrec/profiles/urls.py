@@ -1,8 +1,22 @@
+from datetime import datetime
 from pathlib import Path
 import random
 
-from db import get_profile_urls_from_ratings, get_profiles_wins_100
+from db import (
+    get_boxer_ids_from_ratings,
+    get_new_boxer_ids_from_ratings,
+    get_profiles_wins_100,
+)
 from config import ScrapeConfig
+from journal import CrawlJournal, DONE, PENDING
+from export import SNAPSHOT_KIND, open_snapshot_store
+from snapshotstore import SnapshotStore
+from pending import pending_ids
+
+# URL suffix of each career page (catalog part) of a profile.
+CAREER_PAGE_SUFFIXES = ("", "?&offset=100", "?&offset=200")
+# Journal high-water mark: the newest ratings upload date already queued.
+RATINGS_WATERMARK = "ratings.upload_date"
 
 
 def get_files(path: Path) -> Path:
@@ -14,22 +28,55 @@ def get_files(path: Path) -> Path:
     return files
 
 
-def get_profile_urls_rem(config: ScrapeConfig) -> list[str]:
-    """Returns an ordered list of URLs by comparing all URLs possible and URLs saved in the specified config directory."""
-
-    all_profile_urls = get_profile_urls_from_ratings(config)
+def cataloged_profile_urls(config: ScrapeConfig, store: SnapshotStore) -> list[str]:
+    """Returns the URL of every cataloged profile page, career page offsets included."""
 
-    files = get_files(config.collected_profiles_dir)
-    collected_profile_urls = [
-        (config.base_url + config.base_href + str(i).split("id-")[1].split(".")[0])
-        for i in files
+    return [
+        build_next_url(config, boxrec_id) + CAREER_PAGE_SUFFIXES[part]
+        for boxrec_id, part in store.pages(SNAPSHOT_KIND)
     ]
-    profile_urls_rem = [x for x in all_profile_urls if x not in collected_profile_urls]
+
+
+def get_profile_ids_rem(config: ScrapeConfig) -> list[int]:
+    """Returns the boxer IDs in the ratings table whose profile page is not yet in the snapshot catalog."""
+
+    with open_snapshot_store(config) as store:
+        collected = {int(i) for i, part in store.pages(SNAPSHOT_KIND) if part == 0}
+
+    return pending_ids(get_boxer_ids_from_ratings(), collected)
+
+
+def get_profile_urls_rem(config: ScrapeConfig) -> list[str]:
+    """Returns an ordered list of the profile URLs from the ratings table not yet in the snapshot catalog."""
+
+    profile_urls_rem = [config.root_url + str(i) for i in get_profile_ids_rem(config)]
     # random.shuffle(profile_urls_rem)
 
     return profile_urls_rem
 
 
+def get_profile_urls_pending(config: ScrapeConfig, refresh: bool = False) -> list[str]:
+    """Returns the profile URLs still pending in the crawl journal, after queueing the boxers added to the ratings table since the last run; the journal is re-seeded from the whole table and reconciled with the snapshot catalog (failed URLs retried) on first use or when refresh=True."""
+
+    with CrawlJournal(config.journal_file) as journal:
+        seed = refresh or not journal.is_seeded()
+        # Every ratings run can add boxers to the ratings table; only rows uploaded past the journal's mark are read, and URLs already journaled keep their state.
+        mark = None if seed else journal.watermark(RATINGS_WATERMARK)
+        boxer_ids, latest = get_new_boxer_ids_from_ratings(
+            datetime.fromisoformat(mark) if mark else None
+        )
+        journal.add([config.root_url + str(i) for i in boxer_ids])
+        if seed:
+            journal.mark(journal.failed(), PENDING)
+            with open_snapshot_store(config) as store:
+                journal.mark(cataloged_profile_urls(config, store), DONE)
+            journal.set_seeded()
+        if latest is not None:
+            journal.set_watermark(RATINGS_WATERMARK, str(latest))
+
+        return journal.pending()
+
+
 def build_next_url(config: ScrapeConfig, boxrec_id: int) -> str:
 
     url = config.base_url + config.base_href + str(boxrec_id)
@@ -63,22 +110,30 @@ async def filename_to_url(file: str) -> str:
     return str(file).split("id-")[1].split(".")[0].strip()
 
 
-async def top_hundred_profile_urls(config: ScrapeConfig) -> list[str]:
-
-    snapshots = get_files("snapshots")
-    print(f"Files already saved in 'snapshots': {len(snapshots)}\n")
+def top_hundred_pages_rem(config: ScrapeConfig) -> list[tuple[int, int]]:
+    """Returns (boxer ID, career page) for every page of the 100+ bout careers not yet in the snapshot catalog."""
 
-    url_list = []
+    with open_snapshot_store(config) as store:
+        collected = {(int(i), part) for i, part in store.pages(SNAPSHOT_KIND)}
+    print(f"Pages already in the snapshot catalog: {len(collected)}\n")
 
-    html_urls = [build_next_url(config, await filename_to_url(x)) for x in snapshots]
+    pages = []
 
     boxers = get_profiles_wins_100()
 
     for item in boxers.items():
         if 100 <= item[1] < 300:
-            url_list.append(build_next_url(config, boxrec_id=item[0]) + "?&offset=100")
+            pages.append((int(item[0]), 1))
         if 200 <= item[1] < 300:
-            url_list.append(build_next_url(config, boxrec_id=item[0]) + "?&offset=200")
-        url_list.append(build_next_url(config, boxrec_id=item[0]))
+            pages.append((int(item[0]), 2))
+        pages.append((int(item[0]), 0))
 
-    return [x for x in url_list if x not in html_urls]
+    return pending_ids(pages, collected)
+
+
+async def top_hundred_profile_urls(config: ScrapeConfig) -> list[str]:
+
+    return [
+        build_next_url(config, boxrec_id) + CAREER_PAGE_SUFFIXES[part]
+        for boxrec_id, part in top_hundred_pages_rem(config)
+    ]
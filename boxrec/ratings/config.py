@@ -17,6 +17,20 @@ class ScrapeConfig:
     base_href: str
     collected_snapshots_dir: str
     headers: str
+    rate_limit: float = 5.0
+    rate_burst: int = 10
+    concurrency: int = 10
+    max_concurrency: int = 50
+    max_attempts: int = 4
+    retry_base_delay: float = 1.0
+    journal_file: str = "./crawl-journal.sqlite3"
+    snapshot_store_dir: str = "./snapshot-store"
+    skip_unchanged: bool = False
+    keep_versions: int = 3
+    bundle_file: str = "./snapshot-bundle.tar"
+    parse_from_bundle: bool = False
+    html_parser: str = "lxml"
+    targeted_parsing: bool = True
 
 
 def read_config(config_file: str) -> ScrapeConfig:
@@ -1,5 +1,7 @@
 from datetime import datetime
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+import asyncio
 import time
 import csv
 
@@ -7,6 +9,7 @@ import pandas as pd
 
 from config import ScrapeConfig
 from log import log_msg
+from snapshotstore import SnapshotStore, sync_catalog
 
 
 def save_rows_to_csv(config: ScrapeConfig, rows: list[tuple[int, str, float]]) -> None:
@@ -51,31 +54,134 @@ async def save_df_to_csv(config: ScrapeConfig, df: pd.DataFrame) -> None:
     )
 
 
-async def export_scraped_content(pages_content: list[str]) -> None:
-    """Saves html scraped from ratings pages to a locally accessible directory."""
+SNAPSHOT_KIND = "ratings"
 
-    start = time.perf_counter()
 
-    scrape_output_dir = Path().resolve() / "snapshots"
-    scrape_output_dir.mkdir(parents=True, exist_ok=True)
+def snapshot_key(page_content: dict) -> str:
+    """Returns the snapshot store key a scraped ratings page is saved under (the old snapshots file name, less its extension)."""
+
+    return f"pg-{page_content.get('page_num')}"
+
+
+def describe_snapshot(key: str) -> tuple[str, str, int, str]:
+    """Returns the catalog (kind, ident, part, shard) of a ratings snapshot key (ratings pages are not sharded), or None if the key is not a ratings page."""
+
+    if not key.startswith("pg-"):
+        return None
+
+    return SNAPSHOT_KIND, key.split("pg-")[1], 0, None
+
+
+def save_snapshot(store: SnapshotStore, page_content: dict) -> None:
+    """Saves html scraped from a single ratings page to the snapshot store."""
+
+    page_num = page_content.get("page_num")
+
+    try:
+        store.put(
+            snapshot_key(page_content),
+            page_content.get("response_text"),
+            page_content.get("url"),
+            SNAPSHOT_KIND,
+            str(page_num),
+        )
+    except UnicodeEncodeError:
+        log_msg(
+            f"Ratings Page: {page_num}, did NOT have the proper encoding and was skipped."
+        )
+
 
-    for count, result in enumerate(pages_content):
-        page_num = result.get("page_num")
-        response_text = result.get("response_text")
-        output_file = scrape_output_dir / f"pg-{page_num}.html"
+def open_snapshot_store(config: ScrapeConfig) -> SnapshotStore:
+    """Opens the snapshot store, registering the ratings archive directory with its catalog on first use."""
 
+    store = SnapshotStore(config.snapshot_store_dir)
+    sync_catalog(store, config.collected_snapshots_dir, describe_snapshot)
+
+    return store
+
+
+class SnapshotWriter:
+    """Saves scraped pages from a bounded queue on a dedicated writer thread, in batches that are synced to disk once each, so disk latency never holds up the event loop."""
+
+    def __init__(
+        self,
+        save: Callable[[dict], None],
+        sync: Callable[[], None] = None,
+        maxsize: int = 100,
+        batch_size: int = 25,
+        on_saved: Callable[[dict], None] = None,
+    ) -> None:
+        self.save = save
+        self.sync = sync
+        # Called (on the event loop) for each page once its batch is saved and synced, e.g. to journal its URL as done.
+        self.on_saved = on_saved
+        self.queue = asyncio.Queue(maxsize)
+        self.batch_size = batch_size
+        # One thread keeps appends to the open segment in arrival order.
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="snapshot-writer")
+        self.saved = 0
+
+    async def __aenter__(self) -> "SnapshotWriter":
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
         try:
-            output_file.write_text(response_text)
-            log_msg(
-                f"Saved html file: {count+1}/{len(pages_content)}... ratings page#: {page_num}"
-            )
-        except:
-            log_msg(
-                f"Ratings Page: {page_num}, did NOT have the proper encoding and was skipped."
-            )
-            continue
+            await self.put(None)
+            await self.task
+        finally:
+            self.executor.shutdown()
 
-    elapsed = time.perf_counter() - start
-    log_msg(
-        f"\n[RatingsExport]: Ratings Scraper has saved the available ratings page html bodies: {elapsed} seconds!\n"
-    )
+    def check(self) -> None:
+        """Re-raises the error that stopped the writer task, if it has stopped."""
+
+        if self.task.done():
+            self.task.result()
+            raise RuntimeError("The snapshot writer has stopped.")
+
+    async def put(self, page: dict) -> None:
+        """Hands a fetched page to the writer, waiting if the queue is full; raises the writer's error instead if it stops (e.g. the disk is full), so a crawl can never wait on a dead writer."""
+
+        self.check()
+        put = asyncio.create_task(self.queue.put(page))
+        try:
+            await asyncio.wait((put, self.task), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stuck = not put.done()
+            put.cancel()
+        if stuck:
+            self.check()
+
+    def save_batch(self, pages: list[dict]) -> None:
+        """Saves a batch of pages and syncs them to disk together (runs on the writer thread)."""
+
+        for page in pages:
+            self.save(page)
+        if self.sync is not None:
+            self.sync()
+
+        log_msg(f"Saved {len(pages)} snapshots... total: {self.saved + len(pages)}")
+
+    async def run(self) -> None:
+        """Writes queued pages in batches (whatever has queued up while the last batch was written) until the closing sentinel arrives."""
+
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            pages = [await self.queue.get()]
+            while len(pages) < self.batch_size and not self.queue.empty():
+                pages.append(self.queue.get_nowait())
+
+            closing = pages[-1] is None
+            pages = [page for page in pages if page is not None]
+            if not pages:
+                continue
+
+            await loop.run_in_executor(self.executor, self.save_batch, pages)
+            if self.on_saved is not None:
+                for page in pages:
+                    self.on_saved(page)
+            # Release the bodies once they are on disk so memory stays flat for the rest of the crawl.
+            for page in pages:
+                page["response_text"] = None
+            self.saved += len(pages)
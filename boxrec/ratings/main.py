@@ -9,7 +9,7 @@ from transform import rows_to_df
 from export import save_df_to_csv
 from db import make_new_ratings_table, insert_to_db_table
 from log import log_msg
-from urls import get_urls, get_urls_rem, get_files
+from urls import get_urls, get_urls_pending, get_urls_rem, get_files
 
 
 async def run_sequence(*functions: Awaitable[Any]) -> None:
@@ -32,24 +32,26 @@ async def main():
     # 1. CONFIGURATION: create urls to scrape
     config = read_config("./config.json")
 
-    urls = get_urls(config, get_all=False, how_many=5)
+    # urls = get_urls(config, how_many=5)
+    urls = get_urls_pending(config)
 
     # 2. SCRAPER: scrape given URLs and save profile page html files
     scraper = RatingsScraper(config)
     await scraper.scrape(urls)
 
     # 3. PARSER: parse each result (html) for its rows of data.
-    p = RatingsParser(config)
-    rows = await p.parse()
-
-    # 4. TRANSFORMS: create, transform, and clean dataframe w/ Pandas.
-    df = await rows_to_df(rows)
-
-    # 5. EXPORTS: export data to a .csv file and insert dataframe into SQLServer database.
-    await run_parallel(
-        save_df_to_csv(config, df),
-        run_sequence(make_new_ratings_table(), insert_to_db_table(df)),
-    )
+    with RatingsParser(config) as p:
+        rows = await p.parse()
+
+        # 4. TRANSFORMS: create, transform, and clean dataframe w/ Pandas.
+        df = await rows_to_df(rows)
+
+        # 5. EXPORTS: export data to a .csv file and insert dataframe into SQLServer database.
+        await run_parallel(
+            save_df_to_csv(config, df),
+            run_sequence(make_new_ratings_table(), insert_to_db_table(df)),
+        )
+        p.mark_parsed()
 
 
 if __name__ == "__main__":
@@ -3,10 +3,16 @@ import unicodedata
 from pathlib import Path
 from typing import Any
 
-from bs4 import BeautifulSoup as bs
+from bs4 import BeautifulSoup as bs, SoupStrainer
+from bs4.builder import builder_registry
 
 from config import ScrapeConfig
 from log import log_msg
+from snapshotstore import SnapshotBundle, snapshot_documents
+from export import SNAPSHOT_KIND, open_snapshot_store
+
+# The only parts of a ratings page extract_rows reads; with targeted_parsing the rest (navigation, ads, scripts) is never built into a tree.
+RATINGS_PAGE_PARTS = SoupStrainer(["title", "span", "tbody"])
 
 
 def clean_str(text: str) -> str:
@@ -21,10 +27,23 @@ def clean_str(text: str) -> str:
     )
 
 
-async def create_soup(response_text: str) -> bs:
-    """Uses BeatifulSoup to convert response.text (html) into a BeautifulSoup object."""
+def soup_backend(name: str) -> str:
+    """Returns the BeautifulSoup tree builder to parse with: the configured one (e.g. the C-accelerated "lxml") when it is installed, else the pure-Python "html.parser"."""
+
+    return name if builder_registry.lookup(name) is not None else "html.parser"
+
+
+async def create_soup(
+    response_text: str | bytes,
+    features: str = "html.parser",
+    parse_only: SoupStrainer = None,
+) -> bs:
+    """Uses BeatifulSoup (with the given tree builder) to convert response.text (html), or the raw bytes of a saved snapshot, into a BeautifulSoup object; given parse_only, only the matching parts of the page are built."""
+
+    if isinstance(response_text, bytes):
+        return bs(response_text, features, parse_only=parse_only, from_encoding="utf-8")
 
-    return bs(response_text, "html.parser")
+    return bs(response_text, features, parse_only=parse_only)
 
 
 class PageRatingsHTMLNotRenderedError(Exception):
@@ -36,24 +55,45 @@ class PageRatingsHTMLNotRenderedError(Exception):
 class RatingsParser:
     def __init__(self, config: ScrapeConfig):
         self.config = config
-        self.files = self.mount_files()
-        self.archive = self.mount_archive()
+        self.features = soup_backend(config.html_parser)
+        self.parse_only = RATINGS_PAGE_PARTS if config.targeted_parsing else None
+        self.store = open_snapshot_store(config)
+        # With skip_unchanged, only pages whose content changed since the last mark_parsed() are read.
+        self.since = (
+            self.store.watermark(type(self).__name__) if config.skip_unchanged else None
+        )
+        self.cataloged_at = time.time()
+        self.files = self.mount_catalog()
+
+    def mount_catalog(self) -> list:
+        """Function called to initialize access to cataloged ratings pages (registering the archive directory on first use) as class instance variable."""
+
+        # With parse_from_bundle, pages are read in place from an exported bundle instead of the store.
+        self.source = (
+            SnapshotBundle(self.config.bundle_file)
+            if self.config.parse_from_bundle
+            else self.store
+        )
 
-    def mount_files(self) -> Path:
-        """Function called to initialize access to saved html files from scraper as class instance variable."""
+        return snapshot_documents(self.source, SNAPSHOT_KIND, self.since)
 
-        directory = "snapshots"
-        files = list(Path(directory).glob("*"))
+    def mark_parsed(self) -> None:
+        """Records that every page in this parser's catalog has been parsed and loaded, so a later skip_unchanged run starts after them."""
 
-        return files
+        self.store.set_watermark(type(self).__name__, self.cataloged_at)
 
-    def mount_archive(self) -> Path:
-        """Function called to initialize access to archived html files as class instance variable."""
+    def __enter__(self) -> "RatingsParser":
+        return self
 
-        directory = self.config.collected_snapshots_dir
-        files = list(Path(directory).glob("*"))
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
 
-        return files
+    def close(self) -> None:
+        """Closes the bundle the catalog was read from (if any) and the snapshot store."""
+
+        if self.source is not self.store:
+            self.source.close()
+        self.store.close()
 
     async def extract_rows(
         self, response_text: str
@@ -63,7 +103,7 @@ class RatingsParser:
         rows = []
         error_rows = []
 
-        soup = await create_soup(response_text)
+        soup = await create_soup(response_text, self.features, self.parse_only)
         tbodies = [i for item in soup.find_all("tbody") for i in item]
         page_num = soup.find_all("span", "pagerCurrent")[-1].text.strip()
 
@@ -112,31 +152,30 @@ class RatingsParser:
         return rows, error_rows
 
     async def parse(self) -> list[tuple[int, str, float]]:
-        """Accesses saved html directory and extracts rows from all files found within."""
+        """Extracts rows from every ratings page in the snapshot store, plus any archived html files the store does not already hold."""
 
         start = time.perf_counter()
 
         all_rows = []
 
-        files = self.archive
-
-        for count, file in enumerate(files):
-            with open(file, "r", encoding="utf-8", errors="ignore") as f:
-                response_text = f.read()
-
-                page_num = str(f).split("pg-")[1].split(".html")[0]
-
-                try:
-                    rows, error_rows = await self.extract_rows(response_text)
-                    all_rows.append(rows)
-                    log_msg(
-                        f"Ratings Parser extracted data from html file: {count+1}/{len(list(files))}... ratings page#: {page_num}"
-                    )
-                except:
-                    log_msg(
-                        f"Ratings Parsing did NOT complete for file: {count+1}/{len(list(files))}... ratings page#: {page_num}"
-                    )
-                    continue
+        files = self.files
+
+        for count, (entry, read) in enumerate(files):
+            response_text = read()
+
+            page_num = entry["ident"]
+
+            try:
+                rows, error_rows = await self.extract_rows(response_text)
+                all_rows.append(rows)
+                log_msg(
+                    f"Ratings Parser extracted data from html file: {count+1}/{len(files)}... ratings page#: {page_num}"
+                )
+            except:
+                log_msg(
+                    f"Ratings Parsing did NOT complete for file: {count+1}/{len(files)}... ratings page#: {page_num}"
+                )
+                continue
 
         elapsed = time.perf_counter() - start
         log_msg(
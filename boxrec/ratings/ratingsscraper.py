@@ -1,14 +1,19 @@
 import asyncio
 import aiohttp
 import time
+from functools import partial
 
 from config import ScrapeConfig
-from export import export_scraped_content
+from export import SnapshotWriter, save_snapshot, snapshot_key
 from log import log_msg
+from journal import CrawlJournal
+from snapshotstore import SnapshotStore
+from throttle import RateLimiter, AdaptiveConcurrency
+from retry import RetryPolicy, DeadLetters
 from request import (
-    create_agents_list,
-    random_header_agent,
-    fetch_with_sem,
+    HeaderFactory,
+    fetch_with_retry,
+    byte_summary,
     silence_event_loop_closed,
 )
 from urls import curr_page_num
@@ -17,51 +22,183 @@ from urls import curr_page_num
 class RatingsScraper:
     def __init__(self, config: ScrapeConfig) -> None:
         self.config = config
+        self.policy = RetryPolicy(config.max_attempts, config.retry_base_delay)
+        self.dead_letters = DeadLetters("ratings")
+        self.headers = HeaderFactory.from_config(config)
 
-    async def scrape(self, urls) -> list[str]:
-        """Scrapes list of given URLs and saves them to a locally accessible directory for parsing."""
+    async def scrape_page(self, controller, url, session, limiter) -> dict:
+        """Fetches a single ratings page with retries (conditionally, when a snapshot is already saved), recording it as a dead letter if every attempt fails."""
 
-        start = time.perf_counter()
-        log_msg(
-            f"\n[RatingsScraper]: Ratings Scraper has begun scraping ratings URLs...\n"
+        page_num = await curr_page_num(self.config.base_url, self.config.base_href, url)
+        headers = self.headers()
+        if self.store.has(snapshot_key({"page_num": page_num})):
+            headers.update(self.journal.conditional_headers(url))
+
+        self.journal.start(url)
+        page_content = await fetch_with_retry(
+            self.policy, controller, url, session, headers, page_num, limiter
         )
+        page_content["url"] = url
+        if page_content.get("content_flag") != True:
+            self.dead_letters.add(url, page_content)
 
-        pages_content = []
+        return page_content
 
-        agents = await create_agents_list()
-        sem = asyncio.Semaphore(10)
-        conn = aiohttp.TCPConnector(limit=50)
+    def is_unchanged(self, page_content: dict) -> bool:
+        """True if the server answered 304 or sent back a body byte-identical to the stored snapshot."""
 
-        async with aiohttp.ClientSession(connector=conn) as session:
-            for count, url in enumerate(urls):
-                page_num = await curr_page_num(
-                    self.config.base_url, self.config.base_href, url
-                )
-                headers = await random_header_agent(agents)
+        return page_content.get("not_modified") or page_content.get(
+            "content_hash"
+        ) == self.store.current_hash(snapshot_key(page_content))
 
-                try:
-                    page_content = await fetch_with_sem(
-                        sem, url, session, headers, page_num
+    def finish_saved(self, page_content: dict) -> None:
+        """Journals a page's URL as done once the writer has saved and synced it, so a crash before then leaves it to be fetched again."""
+
+        self.journal.finish(page_content["url"], page_content)
+
+    async def feed(
+        self, frontier: asyncio.Queue, urls: list[str], stop: asyncio.Event
+    ) -> None:
+        """Puts the URLs on the frontier as the workers make room (until the crawl is stopped), then waits for the workers to finish them."""
+
+        for url in urls:
+            if stop.is_set():
+                break
+            await frontier.put(url)
+
+        await frontier.join()
+
+    async def worker(
+        self,
+        frontier: asyncio.Queue,
+        total: int,
+        session: aiohttp.ClientSession,
+        writer: SnapshotWriter,
+        stop: asyncio.Event,
+        controller: AdaptiveConcurrency,
+        limiter: RateLimiter,
+    ) -> None:
+        """Pulls URLs off the frontier and fetches them, handing each changed page to the writer."""
+
+        while True:
+            url = await frontier.get()
+            try:
+                if stop.is_set():
+                    continue
+
+                page_content = await self.scrape_page(controller, url, session, limiter)
+                page_num = page_content.get("page_num")
+                self.done += 1
+
+                if page_content.get("content_flag") == True:
+                    self.scraped += 1
+                    self.wire_bytes += page_content.get("wire_bytes", 0)
+                    self.decoded_bytes += page_content.get("decoded_bytes", 0)
+                    if self.is_unchanged(page_content):
+                        self.unchanged += 1
+                        self.not_modified += bool(page_content.get("not_modified"))
+                        self.journal.finish(url, page_content)
+                        # Never handed to the writer, so its body is released here.
+                        page_content["response_text"] = None
+                    else:
+                        self.changed += 1
+                        # Its URL stays in-flight until the writer has it on disk (see finish_saved).
+                        await writer.put(page_content)
+                    log_msg(
+                        f"Successfully scraped URL: {self.done}/{total}... ratings page#: {page_num} ({page_content.get('wire_bytes', 0)} bytes on the wire, {page_content.get('decoded_bytes', 0)} decoded)"
+                    )
+                else:
+                    self.journal.finish(url, page_content)
+                    page_content["response_text"] = None
+                    log_msg(
+                        f"\nFailed to scrape URL: {self.done}/{total}... ratings page#: {page_num} after {page_content.get('attempts')} attempts // concurrency now: {controller.limit}"
                     )
-                    if page_content.get("content_flag") == True:
-                        pages_content.append(page_content)
+                    if controller.exhausted() and not stop.is_set():
                         log_msg(
-                            f"Successfully scraped URL: {count+1}/{len(urls)}... ratings page#: {page_num}"
+                            f"\n[RatingsScraper]: Pages are still failing at the lowest concurrency, stopping the crawl."
                         )
-                    else:
-                        log_msg(
-                            f"\nFailed to scrape URL: {count+1}/{len(urls)}... ratings page#: {page_num}"
+                        stop.set()
+            finally:
+                frontier.task_done()
+
+    async def scrape(self, urls) -> list[str]:
+        """Scrapes list of given URLs concurrently, saving each page to the snapshot store as soon as it arrives."""
+
+        start = time.perf_counter()
+        log_msg(
+            f"\n[RatingsScraper]: Ratings Scraper has begun scraping ratings URLs...\n"
+        )
+
+        self.scraped = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.not_modified = 0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.done = 0
+
+        self.journal = CrawlJournal(self.config.journal_file)
+        self.journal.add(urls)
+        self.store = SnapshotStore(self.config.snapshot_store_dir)
+
+        # A bounded frontier: a fixed pool of workers pulls from it while feed() tops it up, so the backlog is never held as pending tasks.
+        frontier = asyncio.Queue(maxsize=2 * self.config.max_concurrency)
+        stop = asyncio.Event()
+        controller = AdaptiveConcurrency(
+            self.config.concurrency, self.config.max_concurrency
+        )
+        limiter = RateLimiter(self.config.rate_limit, self.config.rate_burst)
+        conn = aiohttp.TCPConnector(limit=self.config.max_concurrency)
+        async with SnapshotWriter(
+            partial(save_snapshot, self.store),
+            self.store.sync,
+            on_saved=self.finish_saved,
+        ) as writer:
+            async with aiohttp.ClientSession(
+                connector=conn, auto_decompress=False
+            ) as session:
+                workers = [
+                    asyncio.create_task(
+                        self.worker(
+                            frontier,
+                            len(urls),
+                            session,
+                            writer,
+                            stop,
+                            controller,
+                            limiter,
                         )
-                        break
-                except:
-                    log_msg(
-                        f"\nPage: {page_num}, {count+1}/{len(urls)} failed to create page_content >>> broken in the scrape() except: block."
                     )
-                    break
+                    for _ in range(self.config.max_concurrency)
+                ]
+                # A worker only returns by raising (e.g. the writer's error), which ends the crawl.
+                crawl = asyncio.create_task(self.feed(frontier, urls, stop))
+                try:
+                    done, _ = await asyncio.wait(
+                        (crawl, *workers), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                finally:
+                    crawl.cancel()
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(crawl, *workers, return_exceptions=True)
 
         elapsed = time.perf_counter() - start
         log_msg(
-            f"\n[RatingsScraper]: Finished scraping {len(pages_content)} ratings pages: {elapsed} seconds!\n"
+            f"\n[RatingsScraper]: Finished scraping {self.scraped} ratings pages: {elapsed} seconds! ({controller.summary()})\n"
+        )
+
+        log_msg(
+            f"[RatingsScraper]: {self.changed} pages changed, {self.unchanged} unchanged ({self.not_modified} not modified, {self.unchanged - self.not_modified} byte-identical to their snapshot)"
+        )
+
+        log_msg(
+            f"[RatingsScraper]: Transferred {byte_summary(self.wire_bytes, self.decoded_bytes)}"
         )
 
-        await export_scraped_content(pages_content)
+        self.dead_letters.save()
+        log_msg(f"[RatingsScraper]: Crawl journal: {self.journal.counts()}")
+        self.journal.close()
+        self.store.close()
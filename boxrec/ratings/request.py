@@ -1,47 +1,112 @@
-import json
 import random
 import csv
+import hashlib
 import asyncio
+import time
+import zlib
 from asyncio.proactor_events import _ProactorBasePipeTransport
 
-import pandas as pd
 from functools import wraps
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-async def create_agents_list() -> list:
-    """Returns a list of user-agents from a locally accessible .csv file."""
+# Only advertise the encodings decode_body can undo.
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+
+AGENTS_FILE = "./agents/user-agents-list-2022_05_24-02_46_53_PM.csv"
+
+
+def load_agents(filename: str = AGENTS_FILE) -> list[str]:
+    """Returns the list of user-agents from a locally accessible .csv file."""
 
-    filename = "./agents/user-agents-list-2022_05_24-02_46_53_PM.csv"
     with open(filename, newline="") as f:
-        reader = csv.reader(f)
-        data = list(reader)
-        colnames = ["user_agent"]
-        df = pd.read_csv(filename)
-        lst = df.user_agent.tolist()
+        return [row["user_agent"] for row in csv.DictReader(f) if row["user_agent"]]
+
+
+class HeaderFactory:
+    """Hands out request headers from a header template and user-agent pool loaded once per process."""
+
+    def __init__(self, template: dict, agents: list[str]) -> None:
+        self.template = {**template, "Accept-Encoding": ACCEPT_ENCODING}
+        self.agents = agents
 
-        return lst
+    @classmethod
+    def from_config(cls, config) -> "HeaderFactory":
+        """Builds a factory from the config's headers block and the default agents file."""
 
+        return cls(config.headers, load_agents())
 
-async def random_header_agent(lst) -> dict:
-    """Returns a request header with random user-agent from a locally accessible .json file."""
+    def __call__(self) -> dict:
+        """Returns a fresh copy of the template with a randomly chosen user-agent."""
 
-    with open("./config.json") as file:
-        data = json.load(file)
-        headers = dict(data["config"]["headers"])
-        headers["User-Agent"] = str(random.choices(lst, k=1)[0])
+        headers = dict(self.template)
+        headers["User-Agent"] = random.choice(self.agents)
 
         return headers
 
 
+def decode_body(body: bytes, content_encoding: str) -> bytes:
+    """Undoes the Content-Encoding(s) applied to a raw response body."""
+
+    codings = [c.strip().lower() for c in (content_encoding or "").split(",")]
+    for coding in reversed([c for c in codings if c]):
+        if coding in ("gzip", "x-gzip"):
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        elif coding == "deflate":
+            # Servers disagree on whether deflate means zlib-wrapped or raw.
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                body = zlib.decompress(body, -zlib.MAX_WBITS)
+        elif coding == "br" and brotli is not None:
+            body = brotli.decompress(body)
+        elif coding != "identity":
+            raise ValueError(f"Unsupported content encoding: {coding}")
+
+    return body
+
+
+def byte_summary(wire_bytes: int, decoded_bytes: int) -> str:
+    """Returns a readable comparison of bytes transferred against bytes decoded."""
+
+    saved = 100 * (1 - wire_bytes / decoded_bytes) if decoded_bytes else 0.0
+    return f"{wire_bytes / 1_048_576:.2f} MB on the wire for {decoded_bytes / 1_048_576:.2f} MB decoded ({saved:.0f}% saved by compression)"
+
+
 async def fetch(url, session, headers, page_num=None) -> dict:
     """Http request with given parameters that returns dictionary of response data and metadata."""
 
     async with session.get(url, headers=headers) as response:
-        # await asyncio.sleep(random.randrange(1,3))
-        await asyncio.sleep(1)
         try:
-            response_text = await response.text()
             status_code = response.status
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+            # A conditional request answered with 304: the snapshot already saved is still current.
+            if status_code == 304:
+                return {
+                    "page_num": page_num,
+                    "status_code": status_code,
+                    "content_flag": True,
+                    "not_modified": True,
+                    "response_text": None,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "wire_bytes": 0,
+                    "decoded_bytes": 0,
+                    "content_hash": None,
+                }
+
+            # The scrapers' sessions leave bodies compressed so the transferred size can be measured.
+            body = await response.read()
+            wire_bytes = len(body)
+            if not session.auto_decompress:
+                body = decode_body(body, response.headers.get("Content-Encoding"))
+            response_text = body.decode(response.charset or "utf-8")
             content_flag = (
                 bool("<title>BoxRec: Ratings</title>" in response_text) == True
             )
@@ -51,17 +116,71 @@ async def fetch(url, session, headers, page_num=None) -> dict:
                 "status_code": status_code,
                 "content_flag": content_flag,
                 "response_text": response_text,
+                "not_modified": False,
+                "etag": etag,
+                "last_modified": last_modified,
+                "wire_bytes": wire_bytes,
+                "decoded_bytes": len(body),
+                # Lets the scraper tell a byte-identical page from a changed one before saving it.
+                "content_hash": hashlib.sha256(body).hexdigest(),
             }
-        except:
+        except Exception:
             raise Exception("The request was not instantiated successfully.")
 
 
-async def fetch_with_sem(sem, url, session, headers, page_num=None) -> dict:
-    """A wrapper function for URL requests to employ use of semaphore."""
+async def fetch_with_sem(
+    sem, url, session, headers, page_num=None, limiter=None
+) -> dict:
+    """A wrapper function for URL requests to employ use of an AdaptiveConcurrency controller (or semaphore), paced by an optional RateLimiter."""
+
+    if limiter is not None:
+        await limiter.acquire(url)
 
     async with sem:
+        started = time.perf_counter()
+        try:
+            result = await fetch(url, session, headers, page_num)
+        except Exception:
+            if hasattr(sem, "record"):
+                await sem.record(None, time.perf_counter() - started, False)
+            raise
+
+        if hasattr(sem, "record"):
+            await sem.record(
+                result.get("status_code"),
+                time.perf_counter() - started,
+                result.get("content_flag"),
+            )
+
+        return result
+
+
+async def fetch_with_retry(
+    policy, sem, url, session, headers, page_num=None, limiter=None
+) -> dict:
+    """Retries fetch_with_sem per the given RetryPolicy, backing off between attempts, and returns the last result."""
+
+    for attempt in range(1, policy.max_attempts + 1):
+        try:
+            result = await fetch_with_sem(sem, url, session, headers, page_num, limiter)
+        except Exception:
+            # Only errors are retried; a cancel (the scraper stopping its crawl) propagates.
+            result = {
+                "page_num": page_num,
+                "status_code": None,
+                "content_flag": False,
+                "response_text": None,
+            }
+        result["attempts"] = attempt
+
+        if (
+            result.get("content_flag") == True
+            or not policy.retryable(result.get("status_code"))
+            or attempt == policy.max_attempts
+        ):
+            return result
 
-        return await fetch(url, session, headers, page_num)
+        await asyncio.sleep(policy.delay(attempt))
 
 
 def silence_event_loop_closed(func):
@@ -0,0 +1,73 @@
+import json
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from log import log_msg
+
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class RetryPolicy:
+    """Dataclass that describes how often and how patiently a failed request is retried."""
+
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 60.0
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (1-based) failed attempt."""
+
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def retryable(self, status_code) -> bool:
+        """A request is retried after a connection error, a throttling/server status, or a 200 page missing its content."""
+
+        return (
+            status_code is None
+            or status_code in RETRYABLE_STATUS_CODES
+            or status_code == 200
+        )
+
+
+@dataclass
+class DeadLetters:
+    """Dataclass that collects URLs that failed permanently so they can be re-queued by a later run."""
+
+    scraper: str
+    failed: list[dict] = field(default_factory=list)
+
+    def add(self, url: str, result: dict) -> None:
+        """Records a URL with the status and attempt count of its last request."""
+
+        self.failed.append(
+            {
+                "url": url,
+                "status_code": result.get("status_code"),
+                "attempts": result.get("attempts"),
+                "failed_at": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+
+    def save(self) -> None:
+        """Writes the dead-letter list to a .json file in the local 'dead_letters' directory."""
+
+        if not self.failed:
+            return
+
+        output_dir = Path().resolve() / "dead_letters"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        # The random suffix keeps two saves within the same second from overwriting each other.
+        output_file = (
+            output_dir
+            / f"{self.scraper}-{datetime.now().strftime('%Y_%m_%d-%I_%M_%S_%p')}-{uuid.uuid4().hex[:8]}.json"
+        )
+        output_file.write_text(json.dumps(self.failed, indent=2), encoding="utf-8")
+        log_msg(
+            f"\n[DeadLetters]: {len(self.failed)} URLs failed after retrying and were saved to: {output_file}\n"
+        )
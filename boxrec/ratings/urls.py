@@ -1,8 +1,16 @@
+from array import array
+from bisect import bisect_left
 from pathlib import Path
 import random
-from typing import Generator
+from typing import Generator, Sequence
 
 from config import ScrapeConfig
+from journal import CrawlJournal, DONE, PENDING
+from export import SNAPSHOT_KIND, open_snapshot_store
+
+PAGE_SIZE = 50
+# Offsets of every page of the all-time ratings table.
+RATINGS_OFFSETS = range(0, 65450, PAGE_SIZE)
 
 
 def get_files(path: Path) -> Generator[Path, None, None]:
@@ -14,44 +22,57 @@ def get_files(path: Path) -> Generator[Path, None, None]:
     return files
 
 
-def get_folder_offsets(path: Generator[Path, None, None]) -> list[str]:
-    """Accepts a generator of path and iterates over all files to extract the page offset number (URL parameter related to page number)."""
+def get_collected_offsets(config: ScrapeConfig) -> array:
+    """Returns the sorted page offsets of every ratings page in the snapshot catalog as a compact integer array."""
+
+    with open_snapshot_store(config) as store:
+        return array(
+            "l", sorted(page_num_to_offset(x) for x in store.idents(SNAPSHOT_KIND))
+        )
+
+
+def missing_offsets(
+    collected: array, offsets: Sequence[int] = RATINGS_OFFSETS
+) -> list[int]:
+    """Returns the given ascending offsets that are absent from a sorted array of collected offsets, in one merge pass over both."""
 
-    li = []
-    for file in path:
-        with open(file, "r") as f:
-            li.append(str(file).split("pg-")[1].split(".html")[0])
+    missing = []
+    i = bisect_left(collected, offsets[0]) if offsets else 0
+    for offset in offsets:
+        while i < len(collected) and collected[i] < offset:
+            i += 1
+        if i == len(collected) or collected[i] != offset:
+            missing.append(offset)
 
-    return li
+    return missing
 
 
-def offset_to_page_num(offest: str) -> str:
-    """Accepts and converts a page file's offset to a legible page number as String."""
+def offset_to_page_num(offest: int) -> int:
+    """Accepts and converts a page file's offset to a legible page number."""
 
-    page_num = str(int(int(offest) / 50))
+    return int(offest) // PAGE_SIZE
 
-    return page_num
 
+def page_num_to_offset(page_num: int) -> int:
+    """Accepts and converts a page file's page number to an offest (URL parameter)."""
 
-def page_num_to_offset(page_num: str) -> str:
-    """Accepts and converts a page file's page number to an offest (URL parameter) as String."""
+    return int(page_num) * PAGE_SIZE
 
-    offest = str(int(int(page_num) * 50))
 
-    return offest
+def get_offsets_rem(config: ScrapeConfig, urls: list[str]) -> list[int]:
+    """Returns the page offsets of the given URLs whose page is not yet in the snapshot catalog, in ascending order."""
 
+    offsets = sorted({int(url.split("offset=")[1]) for url in urls})
 
-def get_urls_rem(urls: list[str], path: Generator[Path, None, None]) -> list[str]:
-    """Returns a random ordered list of URLs by comparing given URL list and URLs saved in the given path generator."""
+    return missing_offsets(get_collected_offsets(config), offsets)
 
-    all_page_offsets = [url.split("offset=")[1] for url in urls]
 
-    folder_page_nums = get_folder_offsets(path)
-    folder_page_offsets = [page_num_to_offset(x) for x in folder_page_nums]
+def get_urls_rem(config: ScrapeConfig, urls: list[str]) -> list[str]:
+    """Returns a random ordered list of the given URLs whose page is not yet in the snapshot catalog."""
 
-    offsets_rem = [x for x in all_page_offsets if x not in folder_page_offsets]
     urls_rem = [
-        build_next_url(config.base_url, config.base_href, o) for o in offsets_rem
+        build_next_url(config.base_url, config.base_href, o)
+        for o in get_offsets_rem(config, urls)
     ]
     random.shuffle(urls_rem)
 
@@ -69,20 +90,43 @@ def build_next_url(base_url: str, base_href: str, page_offset: int) -> str:
 async def curr_page_num(base_url: str, base_href: str, url: str) -> int:
     """Converts URL to a legible page number."""
 
-    page_num = int(int(url.replace(base_url, "").replace(base_href, "")) / 50)
+    return offset_to_page_num(url.replace(base_url, "").replace(base_href, ""))
 
-    return page_num
 
+def get_urls(config: ScrapeConfig, how_many: int = 0) -> list:
+    """Returns every ratings URL in a random order, or (for a quick debug scrape) a random sample of how_many distinct URLs."""
 
-def get_urls(config: ScrapeConfig, get_all=False, how_many: int = 0) -> list:
-    """Returns all or a specified number of URLs in a list, randomized."""
+    urls = [
+        build_next_url(config.base_url, config.base_href, o) for o in RATINGS_OFFSETS
+    ]
 
-    r = [*range(0, 65450, 50)]
-    urls = [build_next_url(config.base_url, config.base_href, o) for o in r]
+    if how_many:
+        return random.sample(urls, k=how_many)
+
+    random.shuffle(urls)
+    return urls
+
+
+def get_urls_pending(config: ScrapeConfig, refresh: bool = False) -> list[str]:
+    """Returns a random ordered list of ratings URLs still pending in the crawl journal, seeding it from the snapshot catalog on first use (or when refresh=True)."""
+
+    with CrawlJournal(config.journal_file) as journal:
+        if refresh or not journal.is_seeded():
+            journal.mark(journal.failed(), PENDING)
+            journal.add(get_urls(config))
+            with open_snapshot_store(config) as store:
+                journal.mark(
+                    [
+                        build_next_url(
+                            config.base_url, config.base_href, page_num_to_offset(x)
+                        )
+                        for x in store.idents(SNAPSHOT_KIND)
+                    ],
+                    DONE,
+                )
+            journal.set_seeded()
+        urls_rem = journal.pending()
 
-    if get_all == True and how_many == 0:
-        random.shuffle(urls)
-        return urls
+    random.shuffle(urls_rem)
 
-    elif get_all == False:
-        return random.choices(urls, k=how_many)
+    return urls_rem